@@ -6,9 +6,14 @@
 3. 装饰器模式 (Decorator pattern)
 """
 
+import os
 import sys
-import time
+import asyncio
+import functools
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import NamedTuple
 from pathlib import Path
 
 # 添加项目根目录到 Python 路径
@@ -17,131 +22,180 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 from easy_gemini_balance import KeyBalancer
 
 
-def create_test_keys():
+def create_test_keys(count=5):
     """创建测试用的 keys 文件"""
     keys_file = "test_keys.txt"
-    with open(keys_file, "w") as f:
-        # 创建一些测试 keys
-        for i in range(5):
-            f.write(f"AIzaSyTest_Key{i+1}_abcdefghijklmnopqrstuvwxyz:{1.0 + i * 0.1}\n")
+    # 一次性拼接全部内容后单次写入，生成大量 keys 时避免逐行写入的开销
+    content = "".join(
+        f"AIzaSyTest_Key{i+1}_abcdefghijklmnopqrstuvwxyz:{1.0 + i * 0.1}\n"
+        for i in range(count)
+    )
+    with open(keys_file, "w", buffering=1 << 20) as f:
+        f.write(content)
     return keys_file
 
 
-def simulate_api_call(key, should_fail=False, error_code=500):
-    """模拟 API 调用"""
-    print(f"🔑 使用 key: {key[:20]}...")
-    time.sleep(0.1)  # 模拟网络延迟
+@dataclass
+class APICallResult:
+    """模拟 API 调用的结果（使用 __slots__，避免为每次调用分配 dict）"""
+    __slots__ = ("status", "key_used")
+    status: str
+    key_used: str
+
+
+# 设置 EGB_DEMO_FAST=1 时跳过模拟网络延迟，便于测量 balancer 本身的开销
+FAST_MODE = os.environ.get("EGB_DEMO_FAST") == "1"
+
+
+class KeyFingerprint(NamedTuple):
+    """key 的截断显示形式"""
+    short: str    # 前 8 个字符，用于错误信息和结果
+    display: str  # 前 20 个字符，用于日志输出
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(key):
+    """计算并缓存 key 的截断显示形式，避免每次输出时重复切片"""
+    return KeyFingerprint(key[:8] + "...", key[:20] + "...")
+
+
+async def simulate_api_call(key, should_fail=False, error_code=500):
+    """模拟 API 调用（协程，可通过 asyncio.gather 并发执行）"""
+    short, display = fingerprint(key)
+    print(f"🔑 使用 key: {display}")
+    if not FAST_MODE:
+        await asyncio.sleep(0.1)  # 模拟网络延迟
     
     if should_fail:
         # 模拟失败
         if error_code == 400:
-            raise requests.exceptions.HTTPError(f"400 Bad Request for key {key[:8]}...")
+            raise requests.exceptions.HTTPError(f"400 Bad Request for key {short}")
         elif error_code == 403:
-            raise requests.exceptions.HTTPError(f"403 Forbidden for key {key[:8]}...")
+            raise requests.exceptions.HTTPError(f"403 Forbidden for key {short}")
         elif error_code == 429:
-            raise requests.exceptions.HTTPError(f"429 Too Many Requests for key {key[:8]}...")
+            raise requests.exceptions.HTTPError(f"429 Too Many Requests for key {short}")
         else:
-            raise requests.exceptions.HTTPError(f"{error_code} Error for key {key[:8]}...")
+            raise requests.exceptions.HTTPError(f"{error_code} Error for key {short}")
     
     # 模拟成功
-    return {"status": "success", "key_used": key[:8] + "..."}
+    return APICallResult("success", short)
+
+
+def cleanup(path):
+    """删除演示生成的文件（不存在时忽略）"""
+    Path(path).unlink(missing_ok=True)
+
+
+def call_and_capture(func, key):
+    """调用函数，将异常作为结果返回，便于批量处理"""
+    try:
+        return func(key)
+    except Exception as e:
+        return e
+
 
+def create_balancer(db_path, auto_success):
+    """创建 balancer 并导入测试 keys"""
+    balancer = KeyBalancer(db_path=db_path, auto_success=auto_success)
+    balancer.key_manager.import_keys_from_file("test_keys.txt", source="demo")
+    return balancer
 
-def demo_auto_success_mode():
+
+async def demo_auto_success_mode():
     """演示方案1：自动成功模式"""
     print("\n" + "="*60)
     print("🎯 方案1：自动成功模式 (Auto-success mode)")
     print("="*60)
     
     # 创建 balancer，启用自动成功模式
-    balancer = KeyBalancer(
-        keys_file="test_keys.txt",
-        db_path="test_auto_success.db",
-        auto_success=True  # 启用自动成功模式
-    )
+    balancer = create_balancer("test_auto_success.db", auto_success=True)
     
     print("✅ 自动成功模式已启用")
     print("📊 初始状态:")
     print(f"   - 可用 keys: {len(balancer.key_manager.get_available_keys())}")
     
-    # 获取 key 并模拟成功调用
-    print("\n🔄 获取 key 并模拟成功调用...")
-    key = balancer.get_single_key()
-    result = simulate_api_call(key, should_fail=False)
-    print(f"   ✅ API 调用成功: {result}")
+    # 一次获取多个 key，并发模拟成功调用
+    print("\n🔄 获取 keys 并并发模拟成功调用...")
+    keys = balancer.get_keys(3)
+    tasks = [simulate_api_call(key, should_fail=False) for key in keys]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for key, result in zip(keys, results):
+        if isinstance(result, Exception):
+            print(f"   ❌ API 调用失败: {result}")
+            balancer.update_key_health(key, error_code=500)
+        else:
+            print(f"   ✅ API 调用成功: {result}")
     
-    # 注意：这里不需要手动调用 update_key_health(key, success=True)
+    # 注意：成功的 key 不需要手动调用 update_key_health(key, success=True)
     # 因为 auto_success=True，key 已经被自动标记为成功
     
     print("\n📊 调用后的状态:")
-    key_info = balancer.get_key_info(key)
+    key_info = balancer.get_key_info(keys[0])
     print(f"   - Key: {key_info['key']}")
     print(f"   - 最后使用时间: {key_info['last_used']}")
     print(f"   - 在缓存中: {key_info['in_cache']}")
     
     # 清理
-    import os
-    if os.path.exists("test_auto_success.db"):
-        os.unlink("test_auto_success.db")
+    cleanup("test_auto_success.db")
 
 
-def demo_context_manager():
+async def demo_context_manager():
     """演示方案2：上下文管理器"""
     print("\n" + "="*60)
     print("🎯 方案2：上下文管理器 (Context manager)")
     print("="*60)
     
-    balancer = KeyBalancer(
-        keys_file="test_keys.txt",
-        db_path="test_context.db",
-        auto_success=False  # 关闭自动成功模式，使用上下文管理器
-    )
+    # 关闭自动成功模式，使用上下文管理器
+    balancer = create_balancer("test_context.db", auto_success=False)
     
     print("✅ 上下文管理器模式")
     print("📊 初始状态:")
     print(f"   - 可用 keys: {len(balancer.key_manager.get_available_keys())}")
     
     # 使用上下文管理器
-    print("\n🔄 使用上下文管理器获取 key...")
-    with balancer.get_key_context(count=1) as keys:
-        key = keys[0]
-        print(f"   🔑 获取到 key: {key[:20]}...")
+    print("\n🔄 使用上下文管理器获取 keys...")
+    with balancer.get_key_context(count=2) as keys:
+        for key in keys:
+            print(f"   🔑 获取到 key: {fingerprint(key).display}")
         
-        # 模拟成功调用
-        result = simulate_api_call(key, should_fail=False)
-        print(f"   ✅ API 调用成功: {result}")
+        # 并发模拟成功调用
+        results = await asyncio.gather(*(simulate_api_call(key) for key in keys))
+        for result in results:
+            print(f"   ✅ API 调用成功: {result}")
         
         # 上下文管理器会自动处理成功状态
     
     print("\n📊 上下文管理器退出后的状态:")
-    key_info = balancer.get_key_info(key)
+    key_info = balancer.get_key_info(keys[0])
     print(f"   - Key: {key_info['key']}")
     print(f"   - 最后使用时间: {key_info['last_used']}")
     
     # 演示异常情况
     print("\n🔄 演示异常情况...")
+    failed = []
     try:
-        with balancer.get_key_context(count=1) as keys:
-            key = keys[0]
-            print(f"   🔑 获取到 key: {key[:20]}...")
-            
-            # 模拟失败调用
-            simulate_api_call(key, should_fail=True, error_code=403)
+        with balancer.get_key_context(count=2) as keys:
+            tasks = [simulate_api_call(key, should_fail=True, error_code=403) for key in keys]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            failed = [(key, result) for key, result in zip(keys, results)
+                      if isinstance(result, Exception)]
+            if failed:
+                raise failed[0][1]
     except Exception as e:
         print(f"   ❌ API 调用失败: {e}")
-        # 手动处理失败情况
-        balancer.update_key_health(key, error_code=403)
+        # 手动处理失败情况，多个 key 的状态在一个事务中写入
+        with balancer.health_batch():
+            for key, _ in failed:
+                balancer.update_key_health(key, error_code=403)
     
     print("\n📊 异常处理后的状态:")
-    key_info = balancer.get_key_info(key)
+    key_info = balancer.get_key_info(keys[0])
     print(f"   - Key: {key_info['key']}")
     print(f"   - 错误次数: {key_info['error_count']}")
     print(f"   - 连续错误: {key_info['consecutive_errors']}")
     
     # 清理
-    import os
-    if os.path.exists("test_context.db"):
-        os.unlink("test_context.db")
+    cleanup("test_context.db")
 
 
 def demo_decorator_pattern():
@@ -150,55 +204,56 @@ def demo_decorator_pattern():
     print("🎯 方案3：装饰器模式 (Decorator pattern)")
     print("="*60)
     
-    balancer = KeyBalancer(
-        keys_file="test_keys.txt",
-        db_path="test_decorator.db",
-        auto_success=False  # 关闭自动成功模式，使用装饰器
-    )
+    # 关闭自动成功模式，使用装饰器
+    balancer = create_balancer("test_decorator.db", auto_success=False)
+    
+    # 只查询一次可用 keys，供下面的状态输出和两轮并发调用共用
+    keys = [key.key for key in balancer.key_manager.get_available_keys()]
     
     print("✅ 装饰器模式")
     print("📊 初始状态:")
-    print(f"   - 可用 keys: {len(balancer.key_manager.get_available_keys())}")
+    print(f"   - 可用 keys: {len(keys)}")
     
     # 使用装饰器
+    # 装饰器包装的是同步函数，因此交给线程池并发执行，每个线程内部驱动协程；
+    # KeyBalancer 的 key 选择（LRU 轮转和缓存更新）在锁内完成，可以在多个线程中同时调用
     @balancer.with_key_balancing(key_count=1, auto_success=True)
-    def api_call_with_decorator():
+    def api_call_with_decorator(key):
         """使用装饰器自动管理 key 的 API 调用"""
-        # 装饰器会自动获取 key
-        # 这里我们通过 balancer 的当前状态来获取最后使用的 key
-        available_keys = balancer.key_manager.get_available_keys()
-        if available_keys:
-            key = available_keys[0].key
-            print(f"   🔑 装饰器获取到 key: {key[:20]}...")
-            return simulate_api_call(key, should_fail=False)
-        return None
+        print(f"   🔑 装饰器获取到 key: {fingerprint(key).display}")
+        return asyncio.run(simulate_api_call(key, should_fail=False))
     
     # 调用带装饰器的函数
-    print("\n🔄 调用带装饰器的函数...")
-    try:
-        result = api_call_with_decorator()
-        print(f"   ✅ API 调用成功: {result}")
-    except Exception as e:
-        print(f"   ❌ API 调用失败: {e}")
+    print("\n🔄 并发调用带装饰器的函数...")
+    with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+        results = list(executor.map(
+            functools.partial(call_and_capture, api_call_with_decorator), keys, chunksize=1
+        ))
+    # 装饰器已自动标记其获取的 key 的健康状态，这里只输出结果
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"   ❌ API 调用失败: {result}")
+        else:
+            print(f"   ✅ API 调用成功: {result}")
     
     # 演示失败情况
     @balancer.with_key_balancing(key_count=1, auto_success=False)
-    def failing_api_call():
+    def failing_api_call(key):
         """模拟失败的 API 调用"""
-        available_keys = balancer.key_manager.get_available_keys()
-        if available_keys:
-            key = available_keys[0].key
-            print(f"   🔑 装饰器获取到 key: {key[:20]}...")
-            return simulate_api_call(key, should_fail=True, error_code=429)
-        return None
+        print(f"   🔑 装饰器获取到 key: {fingerprint(key).display}")
+        return asyncio.run(simulate_api_call(key, should_fail=True, error_code=429))
     
     print("\n🔄 演示失败的 API 调用...")
-    try:
-        result = failing_api_call()
-        print(f"   ✅ API 调用成功: {result}")
-    except Exception as e:
-        print(f"   ❌ API 调用失败: {e}")
-        # 装饰器会自动处理失败情况
+    with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+        results = list(executor.map(
+            functools.partial(call_and_capture, failing_api_call), keys, chunksize=1
+        ))
+    # 装饰器会自动将其获取的 key 标记为失败，无需再次标记
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"   ❌ API 调用失败: {result}")
+        else:
+            print(f"   ✅ API 调用成功: {result}")
     
     print("\n📊 装饰器处理后的状态:")
     stats = balancer.get_stats()
@@ -207,9 +262,7 @@ def demo_decorator_pattern():
     print(f"   - 不可用 keys: {stats['unavailable_keys']}")
     
     # 清理
-    import os
-    if os.path.exists("test_decorator.db"):
-        os.unlink("test_decorator.db")
+    cleanup("test_decorator.db")
 
 
 def demo_comparison():
@@ -264,7 +317,7 @@ def demo_comparison():
     print("   - 函数式编程：使用方案3（装饰器模式）")
 
 
-def main():
+async def main():
     """主函数"""
     print("🚀 Easy Gemini Balance - 三种改进方案演示")
     print("="*60)
@@ -275,8 +328,8 @@ def main():
     
     try:
         # 演示三种方案
-        demo_auto_success_mode()
-        demo_context_manager()
+        await demo_auto_success_mode()
+        await demo_context_manager()
         demo_decorator_pattern()
         demo_comparison()
         
@@ -286,11 +339,9 @@ def main():
         
     finally:
         # 清理测试文件
-        import os
-        if os.path.exists(keys_file):
-            os.unlink(keys_file)
+        cleanup(keys_file)
         print(f"🧹 清理测试文件: {keys_file}")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -5,22 +5,57 @@ Build and release script for Easy Gemini Balance.
 
 import os
 import sys
+import shlex
+import argparse
 import subprocess
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-def run_command(cmd, check=True):
-    """Run a command and return the result."""
-    print(f"🔄 Running: {cmd}")
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+_dist_cache = {}
+
+def _dist_artifacts(dist_dir="dist"):
+    """Return the wheel and sdist entries in dist/, rescanning only when the directory changes."""
+    mtime = os.stat(dist_dir).st_mtime_ns
+    cached = _dist_cache.get(dist_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    artifacts = {}
+    with os.scandir(dist_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".whl"):
+                artifacts.setdefault("wheel", entry)
+            elif entry.name.endswith(".tar.gz"):
+                artifacts.setdefault("sdist", entry)
     
-    if result.stdout:
-        print(result.stdout)
-    if result.stderr:
-        print(result.stderr)
+    _dist_cache[dist_dir] = (mtime, artifacts)
+    return artifacts
+
+# 子进程都是短生命周期的，跳过 .pyc 写入和用户 site-packages 扫描
+SUBPROCESS_ENV = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1", "PYTHONNOUSERSITE": "1"}
+
+# 安装后的冒烟测试：在同一个解释器中验证 import，并调用已安装的 CLI 入口
+# 退出码：0 成功，1 import 失败，2 CLI 失败
+SMOKE_TEST_SCRIPT = """
+import shutil, subprocess, sys
+from easy_gemini_balance import KeyBalancer
+print('Import OK')
+cli = shutil.which('easy-gemini-balance')
+if cli is None or subprocess.run([cli, '--help'], stdout=subprocess.DEVNULL).returncode != 0:
+    sys.exit(2)
+"""
+
+def run_command(cmd, check=True):
+    """Run a command, streaming its output, and return the result."""
+    if isinstance(cmd, str):
+        cmd = shlex.split(cmd)
+    print(f"🔄 Running: {shlex.join(cmd)}")
+    # 直接继承父进程的 stdout/stderr，输出实时显示且不在内存中缓冲
+    result = subprocess.run(cmd, env=SUBPROCESS_ENV)
     
     if check and result.returncode != 0:
-        print(f"❌ Command failed: {cmd}")
+        print(f"❌ Command failed: {shlex.join(cmd)}")
         sys.exit(1)
     
     return result
@@ -29,13 +64,15 @@ def clean_build():
     """Clean previous build artifacts."""
     print("🧹 Cleaning previous build artifacts...")
     
-    dirs_to_clean = ['build', 'dist', '*.egg-info']
-    for pattern in dirs_to_clean:
-        if os.path.exists(pattern):
-            if os.path.isdir(pattern):
-                shutil.rmtree(pattern)
-            else:
-                os.remove(pattern)
+    # 单次扫描当前目录；'*.egg-info' 之前被当作字面路径检查，从未生效
+    dirs_to_clean = {'build', 'dist'}
+    with os.scandir('.') as entries:
+        for entry in entries:
+            if entry.name in dirs_to_clean or entry.name.endswith('.egg-info'):
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
     
     print("✅ Build artifacts cleaned")
 
@@ -44,7 +81,7 @@ def run_tests():
     print("🧪 Running tests...")
     
     try:
-        result = run_command("uv run python tests/run_tests.py --all", check=False)
+        result = run_command(["uv", "run", "python", "tests/run_tests.py", "--all"], check=False)
         if result.returncode == 0:
             print("✅ All tests passed")
         else:
@@ -61,25 +98,46 @@ def build_package():
     print("🔨 Building package...")
     
     try:
-        run_command("uv run python -m build")
+        run_command(["uv", "run", "python", "-m", "build"])
         print("✅ Package built successfully")
         return True
     except Exception as e:
         print(f"❌ Build failed: {e}")
         return False
 
+def build_binary():
+    """Build a standalone CLI executable with Nuitka (optional)."""
+    print("🔨 Building standalone CLI binary...")
+    
+    # 编译后的可执行文件不再经过解释器启动和逐个模块导入，适合频繁调用的短命令
+    try:
+        run_command([
+            "uv", "run", "--with", "nuitka", "python", "-m", "nuitka",
+            "--onefile", "--follow-imports",
+            "--include-package=easy_gemini_balance",
+            "--output-dir=dist/binary", "--output-filename=egb",
+            "src/easy_gemini_balance/__main__.py",
+        ])
+        print("✅ Binary built: dist/binary/egb")
+        return True
+    except Exception as e:
+        print(f"❌ Binary build failed: {e}")
+        return False
+
 def check_package():
     """Check the built package."""
     print("🔍 Checking built package...")
     
     try:
+        artifacts = _dist_artifacts()
+        
         # Check wheel
-        wheel_file = list(Path("dist").glob("*.whl"))[0]
-        print(f"📦 Wheel file: {wheel_file}")
+        wheel_file = artifacts["wheel"]
+        print(f"📦 Wheel file: {wheel_file.path}")
         
         # Check source distribution
-        sdist_file = list(Path("dist").glob("*.tar.gz"))[0]
-        print(f"📦 Source distribution: {sdist_file}")
+        sdist_file = artifacts["sdist"]
+        print(f"📦 Source distribution: {sdist_file.path}")
         
         # Show file sizes
         print(f"📏 Wheel size: {wheel_file.stat().st_size / 1024:.1f} KB")
@@ -96,27 +154,24 @@ def test_installation():
     
     try:
         # Install the wheel
-        wheel_file = list(Path("dist").glob("*.whl"))[0]
-        run_command(f"uv pip install {wheel_file}")
+        wheel_file = _dist_artifacts()["wheel"]
+        run_command(["uv", "pip", "install", wheel_file.path])
         
-        # Test CLI
-        result = run_command("uv run easy-gemini-balance --help", check=False)
+        # Test Python import and CLI with a single interpreter start
+        result = run_command(["uv", "run", "python", "-c", SMOKE_TEST_SCRIPT], check=False)
         if result.returncode == 0:
+            print("✅ Python import works")
             print("✅ CLI command works")
-        else:
+        elif result.returncode == 2:
+            print("✅ Python import works")
             print("❌ CLI command failed")
             return False
-        
-        # Test Python import
-        result = run_command("uv run python -c \"from easy_gemini_balance import KeyBalancer; print('Import OK')\"", check=False)
-        if result.returncode == 0:
-            print("✅ Python import works")
         else:
             print("❌ Python import failed")
             return False
         
         # Uninstall for cleanup
-        run_command("uv pip uninstall easy-gemini-balance --yes")
+        run_command(["uv", "pip", "uninstall", "easy-gemini-balance", "--yes"])
         
         return True
     except Exception as e:
@@ -125,6 +180,19 @@ def test_installation():
 
 def main():
     """Main build and release process."""
+    parser = argparse.ArgumentParser(description="Build and release Easy Gemini Balance")
+    parser.add_argument(
+        '--skip-clean-wait',
+        action='store_true',
+        help='Run tests while previous build artifacts are being cleaned'
+    )
+    parser.add_argument(
+        '--binary',
+        action='store_true',
+        help='Also build a standalone CLI executable with Nuitka'
+    )
+    args = parser.parse_args()
+    
     print("🚀 Easy Gemini Balance - Build and Release Script\n")
     
     # Check if we're in the right directory
@@ -132,11 +200,20 @@ def main():
         print("❌ Error: pyproject.toml not found. Please run this script from the project root.")
         sys.exit(1)
     
-    # Clean previous builds
-    clean_build()
+    if args.skip_clean_wait:
+        # 清理和测试涉及的路径互不相交，可以同时进行
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            clean_future = executor.submit(clean_build)
+            tests_passed = run_tests()
+            clean_future.result()
+    else:
+        # Clean previous builds
+        clean_build()
+        
+        # Run tests
+        tests_passed = run_tests()
     
-    # Run tests
-    if not run_tests():
+    if not tests_passed:
         print("❌ Tests failed. Aborting build.")
         sys.exit(1)
     
@@ -145,21 +222,30 @@ def main():
         print("❌ Build failed. Aborting.")
         sys.exit(1)
     
-    # Check package
-    if not check_package():
-        print("❌ Package check failed. Aborting.")
-        sys.exit(1)
+    # Check package and test installation concurrently, failing on the first error
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {
+            executor.submit(check_package): "Package check",
+            executor.submit(test_installation): "Installation test",
+        }
+        for future in as_completed(futures):
+            if not future.result():
+                print(f"❌ {futures[future]} failed. Aborting.")
+                sys.exit(1)
     
-    # Test installation
-    if not test_installation():
-        print("❌ Installation test failed. Aborting.")
+    # 二进制构建在 dist/ 的包检查之后进行，避免 dist/binary 干扰产物扫描
+    if args.binary and not build_binary():
+        print("❌ Binary build failed. Aborting.")
         sys.exit(1)
     
     print("\n🎉 Build and release process completed successfully!")
     print("\n📦 Generated packages:")
     
     for file in Path("dist").glob("*"):
-        print(f"   - {file.name}")
+        if file.is_file():
+            print(f"   - {file.name}")
+    if args.binary:
+        print("   - binary/egb")
     
     print("\n📋 Next steps:")
     print("   1. Review the generated packages in dist/")
@@ -1,15 +1,41 @@
-from .balancer import KeyBalancer
-from .key_manager import KeyManager, APIKey
-from .cli import EasyGeminiCLI, main as cli_main
-from .gemini_client import GeminiClientWrapper, create_gemini_wrapper
-
-__version__ = "0.5.0"
-__all__ = [
-    "KeyBalancer", 
-    "KeyManager", 
-    "APIKey", 
-    "EasyGeminiCLI", 
-    "cli_main",
-    "GeminiClientWrapper",
-    "create_gemini_wrapper"
-]
+from importlib import import_module
+
+# 公开名称 -> (子模块, 属性名)，首次访问时才导入对应子模块
+_LAZY = {
+    "KeyBalancer": ("balancer", "KeyBalancer"),
+    "KeyManager": ("key_manager", "KeyManager"),
+    "APIKey": ("key_manager", "APIKey"),
+    "EasyGeminiCLI": ("cli", "EasyGeminiCLI"),
+    "cli_main": ("cli", "main"),
+    "GeminiClientWrapper": ("gemini_client", "GeminiClientWrapper"),
+    "create_gemini_wrapper": ("gemini_client", "create_gemini_wrapper"),
+}
+
+__all__ = list(_LAZY)
+
+
+def _read_version():
+    """从包元数据读取版本号；importlib.metadata 导入较慢，只在访问 __version__ 时才导入"""
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version("easy-gemini-balance")
+    except PackageNotFoundError:
+        # 从源码目录直接运行（未安装）时没有包元数据
+        return "unknown"
+
+
+def __getattr__(name):
+    if name == "__version__":
+        value = _read_version()
+    else:
+        try:
+            module_name, attr = _LAZY[name]
+        except KeyError:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+        value = getattr(import_module(f".{module_name}", __name__), attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | {"__version__"})
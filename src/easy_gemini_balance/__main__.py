@@ -0,0 +1,8 @@
+"""支持 ``python -m easy_gemini_balance``，也是独立二进制构建的入口"""
+
+import sys
+
+from easy_gemini_balance.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
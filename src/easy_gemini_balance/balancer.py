@@ -3,62 +3,110 @@ Key Balancer with LRU caching and weight-based selection using SSOT pattern.
 All data is stored in and retrieved from SQLite database.
 """
 
-import random
+import threading
 import time
 import functools
+import itertools
+import logging
 from typing import List, Optional, Tuple, Callable, Any, Dict
 from collections import OrderedDict
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from .key_manager import KeyManager, APIKey
 
+try:
+    from lru import LRU
+    LRU_DICT_AVAILABLE = True
+except ImportError:
+    LRU_DICT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _get_error_code(error: Exception) -> Optional[int]:
+    """Extract an HTTP status code from an exception, or ``None`` if it carries none."""
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status_code if isinstance(status_code, int) else None
+
+
+# 只有这些状态码说明问题出在 key（限流/无权限）或服务端，值得换 key 重试
+_FAILOVER_STATUS_CODES = frozenset({429, 403, 500, 502, 503, 504})
+
+
+# 低权重 key 出错后的冷却期
+_ERROR_COOLDOWN = timedelta(minutes=5)
+
+
+def _lru_sort_key(key: APIKey) -> datetime:
+    """Sort key for LRU ordering; never-used keys sort first."""
+    return key.last_used or datetime.min
+
 
 class LRUCache:
     """Simple LRU cache implementation optimized for large key sets."""
     
+    __slots__ = ('capacity', 'cache', 'hits', 'misses')
+    
     def __init__(self, capacity: int):
         self.capacity = capacity
-        self.cache = OrderedDict()
-        self.access_count = 0
+        # 安装了 lru-dict 时使用其 C 实现，由它负责最近使用顺序和淘汰；
+        # 否则使用普通 dict（保持插入顺序，比 OrderedDict 更省内存）
+        self.cache = LRU(capacity) if LRU_DICT_AVAILABLE else {}
+        self.hits = 0
+        self.misses = 0
     
     def get(self, key: str) -> Optional[APIKey]:
         """Get an item from cache and mark it as recently used."""
-        if key in self.cache:
+        value = self.cache.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        if not LRU_DICT_AVAILABLE:
             # Move to end (most recently used)
-            self.cache.move_to_end(key)
-            self.access_count += 1
-            return self.cache[key]
-        return None
+            del self.cache[key]
+            self.cache[key] = value
+        self.hits += 1
+        return value
     
     def put(self, key: str, value: APIKey):
         """Put an item in cache."""
+        if LRU_DICT_AVAILABLE:
+            # 超出容量时自动淘汰最久未使用的项
+            self.cache[key] = value
+            return
+        
         if key in self.cache:
             # Move to end (most recently used)
-            self.cache.move_to_end(key)
-        else:
-            if len(self.cache) >= self.capacity:
-                # Remove least recently used item
-                self.cache.popitem(last=False)
+            del self.cache[key]
+        elif len(self.cache) >= self.capacity:
+            # Remove least recently used item
+            del self.cache[next(iter(self.cache))]
         self.cache[key] = value
     
     def clear(self):
         """Clear the cache."""
         self.cache.clear()
-        self.access_count = 0
+        self.hits = 0
+        self.misses = 0
     
     def get_stats(self) -> dict:
         """Get cache statistics."""
         return {
             'size': len(self.cache),
             'capacity': self.capacity,
-            'hit_rate': self.access_count / max(len(self.cache), 1),
-            'access_count': self.access_count
+            'hit_rate': self.hits / max(self.hits + self.misses, 1),
+            'hits': self.hits,
+            'misses': self.misses,
         }
 
 
 class KeyContext:
     """Context manager for automatic key health management."""
     
+    __slots__ = ('balancer', 'keys', 'success')
+    
     def __init__(self, balancer, keys: List[str]):
         self.balancer = balancer
         self.keys = keys
@@ -71,8 +119,7 @@ class KeyContext:
         if exc_type is None:
             # 没有异常，自动标记为成功
             self.success = True
-            for key in self.keys:
-                self.balancer._mark_key_success(key)
+            self.balancer._mark_keys_success(self.keys)
         else:
             # 有异常，可以在这里处理失败情况
             # 注意：这里不自动标记失败，因为用户可能需要根据具体错误码处理
@@ -91,7 +138,9 @@ class KeyBalancer:
     """
     
     def __init__(self, cache_size: int = 100, db_path: Optional[str] = None, 
-                 auto_save: bool = True, auto_success: bool = True):
+                 auto_save: bool = True, auto_success: bool = True,
+                 db_pragmas: Optional[Dict[str, object]] = None, write_behind: bool = False,
+                 read_only: bool = False):
         """
         Initialize the key balancer.
         
@@ -100,6 +149,11 @@ class KeyBalancer:
             db_path: Path to the SQLite database (defaults to XDG_DATA_HOME)
             auto_save: Whether to automatically save state periodically
             auto_success: Whether to automatically mark keys as successful when retrieved
+            db_pragmas: SQLite PRAGMA overrides passed through to KeyManager
+            write_behind: Whether KeyManager buffers health updates instead of
+                writing each one immediately
+            read_only: Open the database read-only (for inspection tools);
+                auto-save is disabled
         """
         # 根据预期key数量自动调整缓存大小
         if cache_size < 100:
@@ -107,71 +161,124 @@ class KeyBalancer:
         
         self.key_manager = KeyManager(
             db_path=db_path,
-            auto_save=auto_save
+            auto_save=auto_save,
+            db_pragmas=db_pragmas,
+            write_behind=write_behind,
+            read_only=read_only
         )
         self.lru_cache = LRUCache(cache_size)
-        self.last_selection_time = 0
-        self.min_selection_interval = 0.05  # 降低最小选择间隔以支持大量key
+        # 基于 time.monotonic_ns() 的整数纳秒，不受系统时钟调整影响
+        self._last_selection_ns = 0
+        # 默认不限速；仅在 get_keys(block=True) 时生效
+        self._min_selection_interval_ns = 0
+        self._selection_lock = threading.Lock()
         self.selection_count = 0
         self.auto_success = auto_success
         
         # 初始化权重分布相关属性
         self._cumulative_weights = []
         self._available_keys_list = []
+        # 按 LRU 排序的可用 keys 缓存，仅在 key_manager.keys_version 变化时重建
+        self._lru_keys: "OrderedDict[str, APIKey]" = OrderedDict()
+        self._lru_keys_version = -1
+        # 保护 _lru_keys 的原地轮转和遍历，以及 lru_cache 和 selection_count 的更新；
+        # 锁外的读方只会读取 _update_weight_distribution 整体发布的列表
+        self._lru_lock = threading.Lock()
+        # get_key_info 的格式化结果缓存：key 值 -> (状态快照, 信息字典)
+        self._key_info_cache: Dict[str, Tuple[tuple, dict]] = {}
         
         # 性能优化：预计算权重分布
         self._update_weight_distribution()
     
+    @property
+    def min_selection_interval(self) -> float:
+        """Minimum interval in seconds between selections when ``block=True``."""
+        return self._min_selection_interval_ns / 1e9
+    
+    @min_selection_interval.setter
+    def min_selection_interval(self, seconds: float):
+        self._min_selection_interval_ns = int(seconds * 1e9)
+    
+    @property
+    def last_selection_time(self) -> float:
+        """Monotonic time in seconds of the most recent selection."""
+        return self._last_selection_ns / 1e9
+    
+    @property
+    def last_selection_wall(self) -> Optional[float]:
+        """Wall-clock timestamp of the most recent selection, or None if none yet."""
+        if not self._last_selection_ns:
+            return None
+        # 仅在展示时由单调时钟换算，选择路径上不额外读取系统时间
+        return time.time() - (time.monotonic_ns() - self._last_selection_ns) / 1e9
+    
     def _mark_key_success(self, key_value: str):
         """Internal method: mark key as successful."""
-        key_obj = self.key_manager.get_key_by_value(key_value)
-        if key_obj:
-            key_obj.last_used = datetime.now()
-            # 可以在这里添加其他成功逻辑，比如增加权重等
+        self._mark_keys_success([key_value])
+    
+    def _mark_keys_success(self, key_values: List[str]):
+        """Internal method: mark several keys as successful in one pass."""
+        self.key_manager.mark_keys_used(key_values)
+        # 可以在这里添加其他成功逻辑，比如增加权重等
+    
+    def _build_lru_keys(self) -> Optional[Tuple[int, "OrderedDict[str, APIKey]"]]:
+        """Build a fresh LRU order if the key manager's keys have changed, without publishing it."""
+        keys_version = self.key_manager.keys_version
+        if keys_version == self._lru_keys_version:
+            return None
+        # 按 LRU 原则排序：last_used 为 None 的排在前面（从未使用过），然后按 last_used 升序
+        lru_sorted_keys = sorted(self.key_manager.get_available_keys(), key=_lru_sort_key)
+        return keys_version, OrderedDict((key.key, key) for key in lru_sorted_keys)
+    
+    def _record_use(self, key: APIKey):
+        """Cache a just-used key and move it to the end of the LRU order (caller holds ``_lru_lock``)."""
+        self.lru_cache.put(key.key, key)
+        # OrderedDict.move_to_end 为 O(1)，无需在列表中查找和移动元素
+        if key.key in self._lru_keys:
+            self._lru_keys.move_to_end(key.key)
     
     def _update_weight_distribution(self):
         """Update the weight distribution with proper LRU selection."""
-        available_keys = self.key_manager.get_available_keys()
-        if not available_keys:
-            self._available_keys_list = []
-            self._cumulative_weights = []
-            return
-        
-        # 按 LRU 原则排序：last_used 为 None 的排在前面（从未使用过），然后按 last_used 升序
-        lru_sorted_keys = sorted(available_keys, key=lambda k: (k.last_used is None, k.last_used or datetime.min))
+        # 只选择前 5 个最少使用的 keys，避免总是选择相同的 key
+        max_keys_to_consider = 5
         
         # 过滤掉最近有 429 错误的 keys（冷却期）
-        current_time = datetime.now()
-        filtered_keys = []
-        
-        for key in lru_sorted_keys:
-            # 如果最近有 429 错误，检查是否在冷却期内
-            if key.last_error and key.weight <= 0.2:  # 权重很低说明可能有 429 错误
-                time_since_error = current_time - key.last_error
-                if time_since_error.total_seconds() < 300:  # 5分钟冷却期
-                    continue  # 跳过这个 key
-            filtered_keys.append(key)
+        # 预先算出冷却截止时间，循环内只做一次时间比较
+        cooldown_cutoff = datetime.now() - _ERROR_COOLDOWN
+        selected_keys = []
         
-        # 如果没有过滤后的 keys，使用原始列表
-        if not filtered_keys:
-            filtered_keys = lru_sorted_keys
+        # key 集合变化时在锁外完整构建新的 LRU 顺序（排序为 O(N log N)），持锁时只做整体替换
+        rebuilt = self._build_lru_keys()
+        
+        # 其他线程会原地轮转 _lru_keys，遍历必须持锁（最多走到前几个合格的 key 即停止）
+        with self._lru_lock:
+            if rebuilt is not None and rebuilt[0] != self._lru_keys_version:
+                self._lru_keys_version, self._lru_keys = rebuilt
+            lru_sorted_keys = self._lru_keys.values()
+            for key in lru_sorted_keys:
+                if not key.is_available:
+                    continue
+                # 权重很低说明可能有 429 错误，最近出错且仍在冷却期内则跳过
+                # 先比较权重：健康 key 在第一个浮点比较处即短路
+                if key.weight <= 0.2 and key.last_error and key.last_error > cooldown_cutoff:
+                    continue
+                selected_keys.append(key)
+                if len(selected_keys) == max_keys_to_consider:
+                    break
+            
+            # 如果没有过滤后的 keys，使用原始列表
+            if not selected_keys:
+                selected_keys = list(itertools.islice(lru_sorted_keys, max_keys_to_consider))
         
-        # 只选择前 5 个最少使用的 keys，避免总是选择相同的 key
-        max_keys_to_consider = min(5, len(filtered_keys))
-        selected_keys = filtered_keys[:max_keys_to_consider]
+        # 先完整构建新的权重分布，再整体替换属性（读方只会看到完整的旧列表或新列表）
+        cumulative_weights = []
+        weights = [key.weight for key in selected_keys]
+        # 总权重为正时才有有效的分布
+        if sum(weights) > 0:
+            cumulative_weights = list(zip(itertools.accumulate(weights), selected_keys))
         
-        # 更新权重分布
         self._available_keys_list = selected_keys
-        self._cumulative_weights = []
-        
-        if selected_keys:
-            # 计算总权重
-            total_weight = sum(key.weight for key in selected_keys)
-            if total_weight > 0:
-                cumulative = 0
-                for key in selected_keys:
-                    cumulative += key.weight
-                    self._cumulative_weights.append((cumulative, key))
+        self._cumulative_weights = cumulative_weights
     
     def _calculate_time_decay_weight(self, last_used: Optional[datetime], current_time: float) -> float:
         """
@@ -209,13 +316,15 @@ class KeyBalancer:
         # 确保权重在合理范围内
         return max(0.01, min(1.0, time_decay_weight))
     
-    def get_keys(self, count: int = 1) -> List[str]:
+    def get_keys(self, count: int = 1, block: bool = False) -> List[str]:
         """
         Get a specified number of available API keys using LRU and weight-based selection.
         Optimized for large key sets.
         
         Args:
             count: Number of keys to return
+            block: Whether to sleep until ``min_selection_interval`` has passed
+                since the previous selection
             
         Returns:
             List of API key strings
@@ -223,130 +332,60 @@ class KeyBalancer:
         if count <= 0:
             return []
         
+        if count == 1 and not block:
+            # 单个 key 走 get_single_key 的快速路径
+            return [self.get_single_key()]
+        
         # 每次获取keys时都更新权重分布（包含时间衰减）
         self._update_weight_distribution()
         
-        if not self._available_keys_list:
+        return self._select_keys(count, block)
+    
+    def _select_keys(self, count: int, block: bool = False) -> List[str]:
+        """Select keys from the weight distribution prepared by _update_weight_distribution."""
+        # 只读取一次候选列表快照，并发线程替换该属性不会影响本次选择
+        available_keys = self._available_keys_list
+        if not available_keys:
             raise RuntimeError("No available API keys")
         
-        if count > len(self._available_keys_list):
+        if count > len(available_keys):
             # If requesting more keys than available, return all available
-            count = len(self._available_keys_list)
+            count = len(available_keys)
         
         # Apply rate limiting to prevent too frequent selections
-        current_time = time.time()
-        if current_time - self.last_selection_time < self.min_selection_interval:
-            time.sleep(self.min_selection_interval - (current_time - self.last_selection_time))
-        
-        selected_keys = []
-        
-        # 使用真正的 LRU 选择：选择最少使用的 keys
-        if count >= len(self._available_keys_list):
-            selected_keys = self._available_keys_list.copy()
+        if block and self._min_selection_interval_ns > 0:
+            with self._selection_lock:
+                now_ns = time.monotonic_ns()
+                wait_ns = self._min_selection_interval_ns - (now_ns - self._last_selection_ns)
+                # 预留下一个时间槽，并发调用者依次排队
+                self._last_selection_ns = now_ns + max(wait_ns, 0)
+            if wait_ns > 0:
+                time.sleep(wait_ns / 1e9)
         else:
-            # 选择前 count 个最少使用的 keys
-            selected_keys = self._available_keys_list[:count]
-        
-        # Update LRU cache and mark keys as used
-        for key in selected_keys:
-            self.lru_cache.put(key.key, key)
-            # 从key_manager的keys列表中查找对应的key对象
-            for original_key_obj in self.key_manager.keys:
-                if original_key_obj.key == key.key:
-                    original_key_obj.mark_used()
-                    # 打印 key 使用信息
-                    print(f"🔑 使用 Key: {key.key[:20]}... | 权重: {key.weight:.2f} | 总使用次数: {self.selection_count + 1}")
-                    break
-        
-        self.last_selection_time = time.time()
-        self.selection_count += 1
-        
-        # 方案1：自动成功模式
-        key_strings = [key.key for key in selected_keys]
-        if self.auto_success:
-            for key_str in key_strings:
-                self._mark_key_success(key_str)
-        
-        return key_strings
-    
-    def _fast_weighted_selection(self, keys: List[APIKey], count: int) -> List[APIKey]:
-        """
-        Fast weighted selection for large key sets using pre-computed cumulative weights.
-        """
-        if count >= len(keys):
-            return keys.copy()
-        
-        # 使用预计算的权重分布
-        self._update_weight_distribution()
-        
-        selected_keys = []
-        available_keys = keys.copy()
-        total_weight = sum(key.weight for key in available_keys)
-        
-        for _ in range(count):
-            if not available_keys:
-                break
-            
-            # 使用二分查找优化权重选择
-            rand_val = random.uniform(0, total_weight)
-            selected_key = self._binary_search_key(available_keys, rand_val)
-            
-            if selected_key:
-                selected_keys.append(selected_key)
-                available_keys.remove(selected_key)
-                total_weight -= selected_key.weight
-        
-        return selected_keys
-    
-    def _binary_search_key(self, keys: List[APIKey], target_weight: float) -> Optional[APIKey]:
-        """Binary search for key selection based on weight."""
-        if not keys:
-            return None
-        
-        left, right = 0, len(keys) - 1
-        cumulative_weight = 0
+            # 非阻塞调用只记录时间，不加锁也不等待
+            self._last_selection_ns = time.monotonic_ns()
         
-        for i, key in enumerate(keys):
-            cumulative_weight += key.weight
-            if cumulative_weight >= target_weight:
-                return key
-        
-        # Fallback to last key if not found
-        return keys[-1] if keys else None
-    
-    def _standard_weighted_selection(self, keys: List[APIKey], count: int) -> List[APIKey]:
-        """
-        Standard weighted random selection for smaller key sets.
-        """
-        if count >= len(keys):
-            return keys.copy()
-        
-        # Calculate total weight
-        total_weight = sum(key.weight for key in keys)
-        if total_weight <= 0:
-            # Fallback to random selection if all weights are 0
-            return random.sample(keys, count)
-        
-        selected_keys = []
-        available_keys = keys.copy()
+        # 使用真正的 LRU 选择：选择前 count 个最少使用的 keys
+        selected_keys = available_keys[:count]
         
-        for _ in range(count):
-            if not available_keys:
-                break
-            
-            # Weighted random selection
-            rand_val = random.uniform(0, total_weight)
-            cumulative_weight = 0
+        # Update LRU cache and mark keys as used
+        # 候选 key 即 key_manager 中的对象，直接刷新 last_used；同一次选择共用一个时间戳
+        now = datetime.now()
+        log_usage = logger.isEnabledFor(logging.DEBUG)
+        key_strings = []
+        with self._lru_lock:
+            for key in selected_keys:
+                key_strings.append(key.key)
+                key.last_used = now
+                if log_usage:
+                    logger.debug("🔑 使用 Key: %s... | 权重: %.2f | 总使用次数: %d",
+                                 key.key[:20], key.weight, self.selection_count + 1)
+                # 被选中的 key 变为最近使用，移到 LRU 顺序末尾
+                self._record_use(key)
             
-            for i, key in enumerate(available_keys):
-                cumulative_weight += key.weight
-                if cumulative_weight >= rand_val:
-                    selected_keys.append(key)
-                    available_keys.pop(i)
-                    total_weight -= key.weight
-                    break
+            self.selection_count += 1
         
-        return selected_keys
+        return key_strings
     
     def get_single_key(self) -> str:
         """
@@ -355,8 +394,26 @@ class KeyBalancer:
         Returns:
             A single API key string
         """
-        keys = self.get_keys(1)
-        return keys[0] if keys else None
+        # 单个 key 的快速路径：与 get_keys(1) 行为一致，但跳过批量选择的列表处理
+        self._update_weight_distribution()
+        
+        available_keys = self._available_keys_list
+        if not available_keys:
+            raise RuntimeError("No available API keys")
+        
+        key = available_keys[0]
+        self._last_selection_ns = time.monotonic_ns()
+        
+        key.mark_used()
+        with self._lru_lock:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🔑 使用 Key: %s... | 权重: %.2f | 总使用次数: %d",
+                             key.key[:20], key.weight, self.selection_count + 1)
+            self._record_use(key)
+            self.selection_count += 1
+        
+        # 自动成功模式只需刷新 last_used，mark_used() 已完成
+        return key.key
     
     def get_key_context(self, count: int = 1) -> KeyContext:
         """
@@ -397,17 +454,74 @@ class KeyBalancer:
                     result = func(*args, **kwargs)
                     # 自动标记为成功
                     if auto_success:
-                        for key in keys:
-                            self._mark_key_success(key)
+                        self._mark_keys_success(keys)
                     return result
                 except Exception as e:
-                    # 自动标记为失败（使用通用错误码500）
-                    for key in keys:
-                        self.update_key_health(key, error_code=500)
+                    # 自动标记为失败（使用通用错误码500），在一个事务中写入
+                    with self.health_batch():
+                        for key in keys:
+                            self.update_key_health(key, error_code=500)
                     raise
             return wrapper
         return decorator
     
+    def call_with_failover(self, func: Callable[[str], Any], max_attempts: Optional[int] = None) -> Any:
+        """
+        Call ``func`` with successive available keys until one succeeds.
+        
+        The candidates are a snapshot of every available key in LRU order (not
+        just the weighted selection window), taken once up front, so a failed
+        attempt only records the key's health and advances to the next candidate
+        instead of re-acquiring keys.
+        
+        Args:
+            func: Callable receiving the API key string
+            max_attempts: Maximum number of keys to try (defaults to every available key)
+            
+        Returns:
+            The return value of the first successful call
+            
+        Raises:
+            RuntimeError: If no keys are available
+            Exception: Errors without a failover status code (429, 403, 5xx) are
+                re-raised immediately without touching key health; otherwise the
+                last error raised by ``func`` if every attempt failed
+        """
+        self._update_weight_distribution()
+        limit = None if max_attempts is None else max(1, max_attempts)
+        # 其他线程会原地轮转 _lru_keys，持锁按 LRU 顺序取出可用 keys 的快照
+        with self._lru_lock:
+            candidates = list(itertools.islice(
+                (key for key in self._lru_keys.values() if key.is_available), limit
+            ))
+        if not candidates:
+            raise RuntimeError("No available API keys")
+        
+        last_error = None
+        for key in candidates:
+            key.mark_used()
+            with self._lru_lock:
+                self._record_use(key)
+                self.selection_count += 1
+            
+            try:
+                result = func(key.key)
+            except Exception as e:
+                error_code = _get_error_code(e)
+                if error_code not in _FAILOVER_STATUS_CODES:
+                    # 调用方错误（如 400 请求错误或代码异常）与 key 无关，直接抛出
+                    raise
+                # 记录失败并切换到下一个 key
+                last_error = e
+                self.update_key_health(key.key, error_code=error_code)
+                continue
+            
+            if self.auto_success:
+                self._mark_key_success(key.key)
+            return result
+        
+        raise last_error
+    
     def update_key_health(self, key_value: str, error_code: Optional[int] = None, success: bool = False):
         """
         Update the health status of a key.
@@ -423,6 +537,17 @@ class KeyBalancer:
         if error_code == 400 or (success and error_code is None):
             self._update_weight_distribution()
     
+    def health_batch(self):
+        """
+        Get a context manager that batches health updates into one database transaction.
+        
+        Usage:
+            with balancer.health_batch():
+                for key, error_code in failures:
+                    balancer.update_key_health(key, error_code=error_code)
+        """
+        return self.key_manager.batch_updates()
+    
     def get_stats(self) -> dict:
         """
         Get statistics about the key balancer and all keys.
@@ -439,6 +564,7 @@ class KeyBalancer:
         stats.update({
             'cache_stats': cache_stats,
             'last_selection_time': self.last_selection_time,
+            'last_selection_wall': self.last_selection_wall,
             'selection_count': self.selection_count,
             'min_selection_interval': self.min_selection_interval,
             'auto_success_enabled': self.auto_success,
@@ -448,16 +574,33 @@ class KeyBalancer:
         
         return stats
     
+    def get_stats_summary(self) -> dict:
+        """
+        Get key counts and cache statistics only.
+        
+        Cheaper than get_stats() for frequent polling: one count query,
+        no per-key details and no weight distribution refresh.
+        
+        Returns:
+            Dictionary with total_keys, available_keys and cache_stats
+        """
+        stats = self.key_manager.get_key_counts()
+        stats['cache_stats'] = self.lru_cache.get_stats()
+        return stats
+    
     def reload_keys(self):
         """Reload keys from database."""
         self.key_manager._load_from_database()
-        self.lru_cache.clear()
+        with self._lru_lock:
+            self.lru_cache.clear()
+        self._key_info_cache.clear()
         self._update_weight_distribution()
     
     def reset_all_weights(self):
         """Reset weights for all keys."""
         self.key_manager.reset_all_weights()
-        self.lru_cache.clear()
+        with self._lru_lock:
+            self.lru_cache.clear()
         self._update_weight_distribution()
     
     def get_key_info(self, key_value: str) -> Optional[dict]:
@@ -474,7 +617,15 @@ class KeyBalancer:
         if not key:
             return None
         
-        return {
+        # 状态未变化时复用上次格式化的结果，省去重复的 isoformat() 调用
+        in_cache = key.key in self.lru_cache.cache
+        state = (key.weight, key.is_available, key.error_count, key.consecutive_errors,
+                 key.last_used, key.last_error, key.added_time, key.source, in_cache)
+        cached = self._key_info_cache.get(key_value)
+        if cached is not None and cached[0] == state:
+            return dict(cached[1])
+        
+        info = {
             'key': key.key[:8] + '...' if len(key.key) > 8 else key.key,
             'weight': round(key.weight, 2),
             'available': key.is_available,
@@ -482,10 +633,13 @@ class KeyBalancer:
             'consecutive_errors': key.consecutive_errors,
             'last_used': key.last_used.isoformat() if key.last_used else None,
             'last_error': key.last_error.isoformat() if key.last_error else None,
-            'in_cache': key.key in self.lru_cache.cache,
+            'in_cache': in_cache,
             'added_time': key.added_time.isoformat(),
             'source': key.source,
         }
+        self._key_info_cache[key_value] = (state, info)
+        # 返回副本，调用方修改结果不会影响缓存
+        return dict(info)
     
     def save_state_now(self):
         """Manually save state immediately."""
@@ -531,6 +685,8 @@ class KeyBalancer:
             List of key batches
         """
         total_requested = sum(batch_sizes)
+        if total_requested <= 0:
+            return [[] for _ in batch_sizes]
         
         # 更新权重分布
         self._update_weight_distribution()
@@ -538,18 +694,11 @@ class KeyBalancer:
         if total_requested > len(self._available_keys_list):
             raise RuntimeError(f"Requested {total_requested} keys but only {len(self._available_keys_list)} available")
         
-        # 一次性获取所有需要的keys
-        all_keys = self.get_keys(total_requested)
+        # 一次性获取所有需要的keys，权重分布已是最新，无需再次更新
+        all_keys = iter(self._select_keys(total_requested))
         
         # 分割成批次
-        batches = []
-        start_idx = 0
-        for batch_size in batch_sizes:
-            end_idx = start_idx + batch_size
-            batches.append(all_keys[start_idx:end_idx])
-            start_idx = end_idx
-        
-        return batches
+        return [list(itertools.islice(all_keys, batch_size)) for batch_size in batch_sizes]
     
     def get_database_info(self) -> dict:
         """
@@ -558,7 +707,7 @@ class KeyBalancer:
         Returns:
             Dictionary containing database information
         """
-        stats = self.key_manager.get_key_stats()
+        stats = self.key_manager.get_key_stats(include_keys=False)
         return {
             'database_path': self.key_manager.db_path,
             'database_size_mb': stats.get('database_size_mb', 0),
@@ -7,26 +7,24 @@ Command Line Interface for Easy Gemini Balance
 import argparse
 import json
 import sys
+import time
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from .balancer import KeyBalancer
-from .key_manager import KeyManager
-from .gemini_client import GeminiClientWrapper
+if TYPE_CHECKING:
+    from .balancer import KeyBalancer
+    from .key_manager import KeyManager
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
-class EasyGeminiCLI:
-    """Command Line Interface for Easy Gemini Balance"""
-    
-    def __init__(self):
-        self.parser = self._create_parser()
-    
-    def _create_parser(self):
-        """创建命令行参数解析器"""
-        parser = argparse.ArgumentParser(
-            description="Easy Gemini Balance - API Key Management Tool",
-            formatter_class=argparse.RawDescriptionHelpFormatter,
-            epilog="""
+
+_DESCRIPTION = "Easy Gemini Balance - API Key Management Tool"
+
+_EPILOG = """
 Examples:
   # 显示统计信息
   easy-gemini-balance stats
@@ -43,6 +41,49 @@ Examples:
   # 显示导入历史
   easy-gemini-balance import-history
             """
+
+
+def _dumps_json(obj, indent: bool = False) -> str:
+    """序列化为 JSON 字符串；安装了 orjson 时使用其 C 实现"""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=str, option=option).decode()
+    if indent:
+        return json.dumps(obj, indent=2, default=str)
+    return json.dumps(obj, separators=(',', ':'), default=str)
+
+
+class EasyGeminiCLI:
+    """Command Line Interface for Easy Gemini Balance"""
+    
+    # 同一进程中的实例共用一个解析器（测试、批量调用时只构建一次）；
+    # 子命令参数仍在首次用到时添加，之后所有实例复用
+    _parser: Optional[argparse.ArgumentParser] = None
+    _help: Optional[str] = None
+    
+    def __init__(self):
+        cls = type(self)
+        if cls._parser is None:
+            cls._parser = self._create_parser()
+    
+    @property
+    def parser(self) -> argparse.ArgumentParser:
+        """Parser shared by all CLI instances in this process."""
+        return self._parser
+    
+    def _help_text(self) -> str:
+        """顶层帮助文本，与解析器一样在进程内只格式化一次"""
+        cls = type(self)
+        if cls._help is None:
+            cls._help = self.parser.format_help()
+        return cls._help
+    
+    def _create_parser(self):
+        """创建命令行参数解析器"""
+        parser = argparse.ArgumentParser(
+            description=_DESCRIPTION,
+            formatter_class=argparse.RawDescriptionHelpFormatter,
+            epilog=_EPILOG
         )
         
         # 全局选项
@@ -60,42 +101,79 @@ Examples:
             action='store_true',
             help='Output in JSON format'
         )
+        parser.add_argument(
+            '--json-compact',
+            action='store_true',
+            help='Compact JSON output (default when stdout is not a terminal)'
+        )
         
-        # 子命令
+        # 子命令：这里只注册名称和帮助信息，参数在选中该命令时才添加
         subparsers = parser.add_subparsers(
             dest='command',
             help='Available commands'
         )
+        cls = type(self)
+        cls._subparsers = {
+            name: subparsers.add_parser(name, help=help_text)
+            for name, help_text in self._COMMANDS.items()
+        }
+        cls._built_commands = set()
         
-        # stats 命令
-        stats_parser = subparsers.add_parser(
-            'stats',
-            help='Show key statistics'
-        )
-        
-        # health 命令
-        health_parser = subparsers.add_parser(
-            'health',
-            help='Show key health status'
-        )
-        
-        # db-info 命令
-        db_info_parser = subparsers.add_parser(
-            'db-info',
-            help='Show database information'
-        )
-        
-        # memory 命令
-        memory_parser = subparsers.add_parser(
-            'memory',
-            help='Show memory usage information'
-        )
-        
-        # import 命令
-        import_parser = subparsers.add_parser(
-            'import',
-            help='Import keys from a text file'
-        )
+        return parser
+    
+    # 子命令名称 -> 帮助信息
+    _COMMANDS = {
+        'stats': 'Show key statistics',
+        'health': 'Show key health status',
+        'db-info': 'Show database information',
+        'memory': 'Show memory usage information',
+        'import': 'Import keys from a text file',
+        'add-key': 'Add a single API key',
+        'remove-key': 'Remove an API key',
+        'list': 'List all keys',
+        'import-history': 'Show import history',
+        'reset': 'Reset key weights and health status',
+        'cleanup': 'Clean up old unused keys',
+        'monitor': 'Monitor key usage in real-time',
+        'test-keys': 'Test all available keys using Gemini API',
+    }
+    
+    # 带有参数的子命令 -> 添加参数的方法名
+    _COMMAND_BUILDERS = {
+        'import': '_add_import_arguments',
+        'add-key': '_add_add_key_arguments',
+        'remove-key': '_add_remove_key_arguments',
+        'list': '_add_list_arguments',
+        'reset': '_add_reset_arguments',
+        'cleanup': '_add_cleanup_arguments',
+        'monitor': '_add_monitor_arguments',
+        'test-keys': '_add_test_keys_arguments',
+    }
+    
+    def _find_command(self, argv: list) -> Optional[str]:
+        """在解析前找出命令行中的子命令名称"""
+        skip_next = False
+        for token in argv:
+            if skip_next:
+                skip_next = False
+            elif token == '--db-path':
+                # 全局选项的取值不是子命令
+                skip_next = True
+            elif not token.startswith('-'):
+                return token if token in self._subparsers else None
+        return None
+    
+    def _build_command_arguments(self, command: str):
+        """为选中的子命令添加参数（每个命令只添加一次）"""
+        if command in self._built_commands:
+            return
+        self._built_commands.add(command)
+        builder = self._COMMAND_BUILDERS.get(command)
+        if builder:
+            getattr(self, builder)(self._subparsers[command])
+    
+    def _add_import_arguments(self, import_parser):
+        """import 命令参数"""
         import_parser.add_argument(
             'file_path',
             help='Path to the text file containing API keys'
@@ -105,12 +183,9 @@ Examples:
             default='imported',
             help='Source identifier for imported keys (default: imported)'
         )
-        
-        # add-key 命令
-        add_key_parser = subparsers.add_parser(
-            'add-key',
-            help='Add a single API key'
-        )
+    
+    def _add_add_key_arguments(self, add_key_parser):
+        """add-key 命令参数"""
         add_key_parser.add_argument(
             'key_value',
             help='The API key string'
@@ -126,22 +201,16 @@ Examples:
             default='manual',
             help='Source identifier (default: manual)'
         )
-        
-        # remove-key 命令
-        remove_key_parser = subparsers.add_parser(
-            'remove-key',
-            help='Remove an API key'
-        )
+    
+    def _add_remove_key_arguments(self, remove_key_parser):
+        """remove-key 命令参数"""
         remove_key_parser.add_argument(
             'key_value',
             help='The API key string to remove'
         )
-        
-        # list 命令
-        list_parser = subparsers.add_parser(
-            'list',
-            help='List all keys'
-        )
+    
+    def _add_list_arguments(self, list_parser):
+        """list 命令参数"""
         list_parser.add_argument(
             '--available-only',
             action='store_true',
@@ -152,29 +221,28 @@ Examples:
             action='store_true',
             help='Group keys by source'
         )
-        
-        # import-history 命令
-        import_history_parser = subparsers.add_parser(
-            'import-history',
-            help='Show import history'
+        list_parser.add_argument(
+            '--sort-by',
+            choices=['status', 'weight', 'errors', 'last_used', 'key'],
+            default='status',
+            help='Sort order (default: status, available keys first)'
         )
-        
-        # reset 命令
-        reset_parser = subparsers.add_parser(
-            'reset',
-            help='Reset key weights and health status'
+        list_parser.add_argument(
+            '--limit',
+            type=int,
+            help='Show at most N keys'
         )
+    
+    def _add_reset_arguments(self, reset_parser):
+        """reset 命令参数"""
         reset_parser.add_argument(
             '--confirm',
             action='store_true',
             help='Confirm the reset operation'
         )
-        
-        # cleanup 命令
-        cleanup_parser = subparsers.add_parser(
-            'cleanup',
-            help='Clean up old unused keys'
-        )
+    
+    def _add_cleanup_arguments(self, cleanup_parser):
+        """cleanup 命令参数"""
         cleanup_parser.add_argument(
             '--days',
             type=int,
@@ -186,24 +254,18 @@ Examples:
             action='store_true',
             help='Confirm the cleanup operation'
         )
-        
-        # monitor 命令
-        monitor_parser = subparsers.add_parser(
-            'monitor',
-            help='Monitor key usage in real-time'
-        )
+    
+    def _add_monitor_arguments(self, monitor_parser):
+        """monitor 命令参数"""
         monitor_parser.add_argument(
             '--interval',
             type=int,
             default=5,
             help='Update interval in seconds (default: 5)'
         )
-        
-        # test-keys 命令
-        test_keys_parser = subparsers.add_parser(
-            'test-keys',
-            help='Test all available keys using Gemini API'
-        )
+    
+    def _add_test_keys_arguments(self, test_keys_parser):
+        """test-keys 命令参数"""
         test_keys_parser.add_argument(
             '--max-retries',
             type=int,
@@ -222,11 +284,26 @@ Examples:
             default=10,
             help='Page size for models.list API call (default: 10)'
         )
-        
-        return parser
+        test_keys_parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of keys tested concurrently (default: 8)'
+        )
     
     def run(self, args: Optional[list] = None):
         """运行 CLI"""
+        if args is None:
+            args = sys.argv[1:]
+        
+        if len(args) == 1 and args[0] in ('-h', '--help'):
+            # 顶层帮助：直接输出缓存的帮助文本，不经过参数解析和 SystemExit
+            sys.stdout.write(self._help_text())
+            return 0
+        
+        command = self._find_command(args)
+        if command:
+            self._build_command_arguments(command)
         parsed_args = self.parser.parse_args(args)
         
         if not parsed_args.command:
@@ -244,51 +321,66 @@ Examples:
             print(f"❌ Error: {e}")
             return 1
     
+    # 只读取数据库的命令：以只读方式打开数据库，不启动自动保存
+    _READ_ONLY_COMMANDS = {'stats', 'health', 'db-info', 'memory', 'list', 'import-history', 'monitor'}
+    
+    # 子命令 -> (处理方法名, 是否需要 KeyBalancer；否则传入 KeyManager)
+    _COMMAND_HANDLERS = {
+        'stats': ('_show_stats', False),
+        'health': ('_show_health', False),
+        'db-info': ('_show_db_info', False),
+        'memory': ('_show_memory', False),
+        'import': ('_import_keys', False),
+        'add-key': ('_add_key', False),
+        'remove-key': ('_remove_key', False),
+        'list': ('_list_keys', False),
+        'import-history': ('_show_import_history', False),
+        'reset': ('_reset_keys', False),
+        'cleanup': ('_cleanup_keys', False),
+        'monitor': ('_monitor_keys', True),
+        'test-keys': ('_test_keys', True),
+    }
+    
     def _execute_command(self, args):
         """执行具体的命令"""
-        # 创建 KeyManager 实例用于数据库操作
-        key_manager = KeyManager(db_path=args.db_path)
-        
-        # 对于需要 KeyBalancer 的命令，创建 KeyBalancer 实例
-        if args.command in ['monitor', 'test-keys']:
-            balancer = KeyBalancer(db_path=args.db_path)
-        
-        if args.command == 'stats':
-            return self._show_stats(key_manager, args)
-        elif args.command == 'health':
-            return self._show_health(key_manager, args)
-        elif args.command == 'db-info':
-            return self._show_db_info(key_manager, args)
-        elif args.command == 'memory':
-            return self._show_memory(key_manager, args)
-        elif args.command == 'import':
-            return self._import_keys(key_manager, args)
-        elif args.command == 'add-key':
-            return self._add_key(key_manager, args)
-        elif args.command == 'remove-key':
-            return self._remove_key(key_manager, args)
-        elif args.command == 'list':
-            return self._list_keys(key_manager, args)
-        elif args.command == 'import-history':
-            return self._show_import_history(key_manager, args)
-        elif args.command == 'reset':
-            return self._reset_keys(key_manager, args)
-        elif args.command == 'cleanup':
-            return self._cleanup_keys(key_manager, args)
-        elif args.command == 'monitor':
-            return self._monitor_keys(balancer, args)
-        elif args.command == 'test-keys':
-            return self._test_keys(balancer, args)
-        else:
+        # 先查找处理方法，未知命令不会打开数据库
+        handler = self._COMMAND_HANDLERS.get(args.command)
+        if handler is None:
             print(f"❌ Unknown command: {args.command}")
             return 1
+        
+        method_name, needs_balancer = handler
+        read_only = args.command in self._READ_ONLY_COMMANDS
+        
+        if needs_balancer:
+            from .balancer import KeyBalancer
+            target = KeyBalancer(db_path=args.db_path, read_only=read_only)
+        else:
+            # 创建 KeyManager 实例用于数据库操作
+            from .key_manager import KeyManager
+            target = KeyManager(db_path=args.db_path, read_only=read_only)
+        
+        return getattr(self, method_name)(target, args)
+    
+    def _emit_json(self, obj, args):
+        """以 JSON 格式输出；终端中缩进显示，管道/重定向时紧凑输出"""
+        indent = not args.json_compact and sys.stdout.isatty()
+        if ORJSON_AVAILABLE:
+            # orjson 一次性生成整个文档，但速度远快于纯 Python 的逐块编码
+            sys.stdout.write(_dumps_json(obj, indent))
+        elif indent:
+            json.dump(obj, sys.stdout, indent=2, default=str)
+        else:
+            json.dump(obj, sys.stdout, separators=(',', ':'), default=str)
+        sys.stdout.write('\n')
     
-    def _show_stats(self, key_manager: KeyManager, args):
+    def _show_stats(self, key_manager: 'KeyManager', args):
         """显示统计信息"""
-        stats = key_manager.get_key_stats()
+        # 只有 JSON 输出需要每个 key 的详情
+        stats = key_manager.get_key_stats(include_keys=args.json)
         
         if args.json:
-            print(json.dumps(stats, indent=2, default=str))
+            self._emit_json(stats, args)
             return 0
         
         print("📊 Key Statistics")
@@ -310,16 +402,16 @@ Examples:
             print(f"\nCache Stats:")
             print(f"  Size: {cache_stats['size']}/{cache_stats['capacity']}")
             print(f"  Hit Rate: {cache_stats['hit_rate']:.2f}")
-            print(f"  Access Count: {cache_stats['access_count']}")
+            print(f"  Hits/Misses: {cache_stats['hits']}/{cache_stats['misses']}")
         
         return 0
     
-    def _show_health(self, key_manager: KeyManager, args):
+    def _show_health(self, key_manager: 'KeyManager', args):
         """显示健康状态"""
-        stats = key_manager.get_key_stats()
+        stats = key_manager.get_key_stats(include_keys=args.json)
         
         if args.json:
-            print(json.dumps(stats, indent=2, default=str))
+            self._emit_json(stats, args)
             return 0
         
         print("🏥 Key Health Status")
@@ -347,9 +439,9 @@ Examples:
         
         return 0
     
-    def _show_db_info(self, key_manager: KeyManager, args):
+    def _show_db_info(self, key_manager: 'KeyManager', args):
         """显示数据库信息"""
-        stats = key_manager.get_key_stats()
+        stats = key_manager.get_key_stats(include_keys=False)
         db_info = {
             'database_path': key_manager.db_path,
             'database_size_mb': stats.get('database_size_mb', 0),
@@ -360,7 +452,7 @@ Examples:
         }
         
         if args.json:
-            print(json.dumps(db_info, indent=2, default=str))
+            self._emit_json(db_info, args)
             return 0
         
         print("🗄️  Database Information")
@@ -378,12 +470,12 @@ Examples:
         
         return 0
     
-    def _show_memory(self, key_manager: KeyManager, args):
+    def _show_memory(self, key_manager: 'KeyManager', args):
         """显示内存使用信息"""
         memory_info = key_manager.get_memory_usage()
         
         if args.json:
-            print(json.dumps(memory_info, indent=2, default=str))
+            self._emit_json(memory_info, args)
             return 0
         
         print("💾 Memory Usage")
@@ -396,7 +488,7 @@ Examples:
         
         return 0
     
-    def _import_keys(self, key_manager: KeyManager, args):
+    def _import_keys(self, key_manager: 'KeyManager', args):
         """导入 keys 文件"""
         file_path = Path(args.file_path)
         
@@ -411,7 +503,7 @@ Examples:
             result = key_manager.import_keys_from_file(str(file_path), args.source)
             
             if args.json:
-                print(json.dumps(result, indent=2, default=str))
+                self._emit_json(result, args)
                 return 0
             
             print("\n📊 Import Results:")
@@ -432,7 +524,7 @@ Examples:
             print(f"❌ Import failed: {e}")
             return 1
     
-    def _add_key(self, key_manager: KeyManager, args):
+    def _add_key(self, key_manager: 'KeyManager', args):
         """添加单个 key"""
         print(f"➕ Adding key: {args.key_value[:20]}...")
         print(f"Weight: {args.weight}")
@@ -452,7 +544,7 @@ Examples:
             print(f"❌ Failed to add key: {e}")
             return 1
     
-    def _remove_key(self, key_manager: KeyManager, args):
+    def _remove_key(self, key_manager: 'KeyManager', args):
         """移除 key"""
         print(f"🗑️  Removing key: {args.key_value[:20]}...")
         
@@ -470,53 +562,91 @@ Examples:
             print(f"❌ Failed to remove key: {e}")
             return 1
     
-    def _list_keys(self, key_manager: KeyManager, args):
+    def _list_keys(self, key_manager: 'KeyManager', args):
         """列出所有 keys"""
-        stats = key_manager.get_key_stats()
-        keys = stats['keys']
+        if args.json:
+            return self._list_keys_ndjson(key_manager, args)
+        
+        counts = key_manager.get_key_counts()
+        total = counts['available_keys'] if args.available_only else counts['total_keys']
+        label = "Available Keys" if args.available_only else "All Keys"
         
-        if args.available_only:
-            keys = [k for k in keys if k['available']]
-            print(f"🔑 Available Keys ({len(keys)}):")
+        # --limit 只截断输出，标题同时给出实际显示数量和总数
+        if args.limit is not None and 0 <= args.limit < total:
+            print(f"🔑 {label} (showing {args.limit} of {total}):")
         else:
-            print(f"🔑 All Keys ({len(keys)}):")
+            print(f"🔑 {label} ({total}):")
         
         print("=" * 80)
         
-        if args.by_source:
-            # 按来源分组
-            source_groups = {}
-            for key in keys:
-                source = key.get('source', 'unknown')
-                if source not in source_groups:
-                    source_groups[source] = []
-                source_groups[source].append(key)
-            
-            for source, source_keys in source_groups.items():
-                print(f"\n📁 Source: {source} ({len(source_keys)} keys)")
-                print("-" * 40)
-                for key in source_keys:
-                    self._print_key_info(key)
-        else:
-            # 按可用性排序
-            keys.sort(key=lambda x: (not x['available'], x['weight']), reverse=True)
-            for key in keys:
-                self._print_key_info(key)
-        
+        # 过滤、分组和排序都在 SQL 中完成，边查询边输出，不在内存中构建完整列表
+        # 每 _LIST_WRITE_CHUNK 行写一次 stdout，终端下也不会逐行系统调用
+        lines = []
+        current_source = None
+        for key_value, weight, available, error_count, source, source_count in key_manager.iter_keys(
+            available_only=args.available_only, by_source=args.by_source,
+            order=args.sort_by, limit=args.limit
+        ):
+            if args.by_source and source != current_source:
+                # 按来源排序后，来源变化即为新分组
+                current_source = source
+                lines.append(f"\n📁 Source: {source or 'unknown'} ({source_count} keys)")
+                lines.append("-" * 40)
+            lines.append(self._format_key_info({
+                'key': key_value[:8] + '...' if len(key_value) > 8 else key_value,
+                'weight': round(weight, 2),
+                'available': bool(available),
+                'error_count': error_count,
+                'source': source or 'unknown',
+            }))
+            if len(lines) >= self._LIST_WRITE_CHUNK:
+                self._write_lines(lines)
+                lines = []
+        
+        self._write_lines(lines)
+        return 0
+    
+    def _list_keys_ndjson(self, key_manager: 'KeyManager', args):
+        """以 NDJSON 格式流式输出 keys（每行一条记录），内存占用与 key 数量无关"""
+        lines = []
+        for key_value, weight, available, error_count, source, _ in key_manager.iter_keys(
+            available_only=args.available_only, by_source=args.by_source,
+            order=args.sort_by, limit=args.limit
+        ):
+            lines.append(_dumps_json({
+                'key': key_value[:8] + '...' if len(key_value) > 8 else key_value,
+                'weight': round(weight, 2),
+                'available': bool(available),
+                'error_count': error_count,
+                'source': source or 'unknown',
+            }))
+            if len(lines) >= self._LIST_WRITE_CHUNK:
+                self._write_lines(lines)
+                lines = []
+        
+        self._write_lines(lines)
         return 0
     
-    def _print_key_info(self, key: dict):
-        """打印单个 key 信息"""
+    # _list_keys 每次写入 stdout 的行数
+    _LIST_WRITE_CHUNK = 1000
+    
+    def _write_lines(self, lines: list):
+        """一次性写出多行文本"""
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+    
+    def _format_key_info(self, key: dict) -> str:
+        """格式化单个 key 信息"""
         status = "✅" if key['available'] else "❌"
-        print(f"{status} {key['key']} | Weight: {key['weight']} | "
-              f"Errors: {key['error_count']} | Source: {key.get('source', 'unknown')}")
+        return (f"{status} {key['key']} | Weight: {key['weight']} | "
+                f"Errors: {key['error_count']} | Source: {key.get('source', 'unknown')}")
     
-    def _show_import_history(self, key_manager: KeyManager, args):
+    def _show_import_history(self, key_manager: 'KeyManager', args):
         """显示导入历史"""
         history = key_manager.get_import_history()
         
         if args.json:
-            print(json.dumps(history, indent=2, default=str))
+            self._emit_json(history, args)
             return 0
         
         if not history:
@@ -536,7 +666,7 @@ Examples:
         
         return 0
     
-    def _reset_keys(self, key_manager: KeyManager, args):
+    def _reset_keys(self, key_manager: 'KeyManager', args):
         """重置 key 权重和健康状态"""
         if not args.confirm:
             print("⚠️  This will reset all key weights and health status!")
@@ -553,7 +683,7 @@ Examples:
             print(f"❌ Reset failed: {e}")
             return 1
     
-    def _cleanup_keys(self, key_manager: KeyManager, args):
+    def _cleanup_keys(self, key_manager: 'KeyManager', args):
         """清理旧的未使用的 keys"""
         if not args.confirm:
             print(f"⚠️  This will remove keys unused for {args.days} days!")
@@ -570,7 +700,7 @@ Examples:
             print(f"❌ Cleanup failed: {e}")
             return 1
     
-    def _monitor_keys(self, balancer: KeyBalancer, args):
+    def _monitor_keys(self, balancer: 'KeyBalancer', args):
         """实时监控 key 使用情况"""
         print(f"📊 Monitoring key usage (update every {args.interval}s)")
         print("Press Ctrl+C to stop")
@@ -578,7 +708,8 @@ Examples:
         
         try:
             while True:
-                stats = balancer.get_stats()
+                # 轮询只需要计数和缓存信息，避免每次都生成完整统计
+                stats = balancer.get_stats_summary()
                 available = stats['available_keys']
                 total = stats['total_keys']
                 health = (available / total * 100) if total > 0 else 0
@@ -586,15 +717,16 @@ Examples:
                 print(f"\r🔄 Health: {health:.1f}% | Available: {available}/{total} | "
                       f"Cache: {stats['cache_stats']['size']}/{stats['cache_stats']['capacity']}", end='')
                 
-                import time
                 time.sleep(args.interval)
                 
         except KeyboardInterrupt:
             print("\n\n✅ Monitoring stopped")
             return 0
     
-    def _test_keys(self, balancer: KeyBalancer, args):
+    def _test_keys(self, balancer: 'KeyBalancer', args):
         """测试所有可用的 keys"""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
         try:
             from .gemini_client import create_gemini_wrapper
         except ImportError:
@@ -605,6 +737,7 @@ Examples:
         print(f"📊 Max retries per key: {args.max_retries}")
         print(f"⏱️  Retry delay: {args.retry_delay} seconds")
         print(f"📄 Page size: {args.page_size}")
+        print(f"🧵 Workers: {args.workers}")
         print("=" * 80)
         
         # 创建 Gemini 包装器，使用传入的 balancer
@@ -623,66 +756,67 @@ Examples:
         print(f"🔑 Found {len(available_keys)} available keys")
         print()
         
-        # 测试每个 key
-        test_results = []
-        total_keys = len(available_keys)
+        # 定义测试操作：调用 models.list API
+        def test_operation(client):
+            return client.models.list(config={"pageSize": args.page_size})
         
-        for i, key in enumerate(available_keys, 1):
-            key_value = key.key
-            print(f"🔍 Testing key {i}/{total_keys}: {key_value[:20]}...")
-            
+        def test_key(key_value):
+            # 截断后的 key 只生成一次，进度、结果和摘要共用
+            short_key = key_value[:20] + '...'
             try:
-                # 定义测试操作：调用 models.list API
-                def test_operation(client):
-                    return client.models.list(config={"pageSize": args.page_size})
-                
-                # 执行测试
-                result = wrapper.execute_with_retry(test_operation)
-                
-                # 测试成功
-                print(f"✅ Key {i}/{total_keys} - SUCCESS")
-                if hasattr(result, 'models'):
-                    print(f"   📊 Models found: {len(result.models)}")
-                else:
-                    print(f"   📊 Result type: {type(result)}")
-                
-                test_results.append({
-                    'key': key_value[:20] + '...',
-                    'status': 'SUCCESS',
-                    'models_count': len(result.models) if hasattr(result, 'models') else 'N/A'
-                })
-                
+                result = wrapper.execute_with_key(key_value, test_operation)
             except Exception as e:
-                # 测试失败
-                print(f"❌ Key {i}/{total_keys} - FAILED: {e}")
-                test_results.append({
-                    'key': key_value[:20] + '...',
+                return {
+                    'key': short_key,
                     'status': 'FAILED',
                     'error': str(e)
-                })
-            
-            print("-" * 60)
-        
-        # 显示测试结果摘要
-        print("\n📊 Test Results Summary")
-        print("=" * 80)
+                }
+            return {
+                'key': short_key,
+                'status': 'SUCCESS',
+                'models_count': len(result.models) if hasattr(result, 'models') else 'N/A'
+            }
+        
+        # 并发测试每个 key（网络 I/O 为主），按完成顺序输出进度
+        total_keys = len(available_keys)
+        test_results = [None] * total_keys
+        workers = max(1, min(args.workers, total_keys))
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(test_key, key.key): index
+                for index, key in enumerate(available_keys)
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                test_results[futures[future]] = result
+                if result['status'] == 'SUCCESS':
+                    print(f"✅ [{done}/{total_keys}] {result['key']} - SUCCESS | "
+                          f"Models found: {result['models_count']}")
+                else:
+                    print(f"❌ [{done}/{total_keys}] {result['key']} - FAILED: {result['error']}")
         
+        # 显示测试结果摘要（先拼好再一次性输出）
         successful_keys = [r for r in test_results if r['status'] == 'SUCCESS']
         failed_keys = [r for r in test_results if r['status'] == 'FAILED']
         
-        print(f"✅ Successful: {len(successful_keys)}/{total_keys}")
-        print(f"❌ Failed: {len(failed_keys)}/{total_keys}")
-        print(f"📈 Success Rate: {(len(successful_keys)/total_keys)*100:.1f}%")
+        lines = [
+            "\n📊 Test Results Summary",
+            "=" * 80,
+            f"✅ Successful: {len(successful_keys)}/{total_keys}",
+            f"❌ Failed: {len(failed_keys)}/{total_keys}",
+            f"📈 Success Rate: {(len(successful_keys)/total_keys)*100:.1f}%",
+        ]
         
         if failed_keys:
-            print("\n❌ Failed Keys:")
-            for result in failed_keys:
-                print(f"   {result['key']}: {result['error']}")
+            lines.append("\n❌ Failed Keys:")
+            lines.extend(f"   {result['key']}: {result['error']}" for result in failed_keys)
         
         if successful_keys:
-            print("\n✅ Successful Keys:")
-            for result in successful_keys:
-                print(f"   {result['key']}: {result['models_count']} models")
+            lines.append("\n✅ Successful Keys:")
+            lines.extend(f"   {result['key']}: {result['models_count']} models" for result in successful_keys)
+        
+        self._write_lines(lines)
         
         # 更新数据库中的 key 状态
         print("\n🔄 Updating key health status in database...")
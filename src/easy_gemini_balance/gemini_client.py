@@ -69,18 +69,26 @@ class GeminiClientWrapper:
         weight_before = key_obj.weight if key_obj else 0.0
         error_count_before = key_obj.error_count if key_obj else 0
         
-        print(f"🔑 当前使用的 key: {api_key[:20]}... | 权重: {weight_before:.2f} | 错误次数: {error_count_before}")
-        print(f"❌ 错误详情: {error}")
-        print(f"📊 错误代码: {error_code}")
+        lines = [
+            f"🔑 当前使用的 key: {api_key[:20]}... | 权重: {weight_before:.2f} | 错误次数: {error_count_before}",
+            f"❌ 错误详情: {error}",
+            f"📊 错误代码: {error_code}",
+        ]
         
         self.balancer.update_key_health(api_key, error_code=error_code)
         
         # 显示错误后的状态
         if key_obj:
-            print(f"📉 错误后状态: 权重 {key_obj.weight:.2f} | 错误次数 {key_obj.error_count} | 可用: {key_obj.is_available}")
+            lines.append(f"📉 错误后状态: 权重 {key_obj.weight:.2f} | 错误次数 {key_obj.error_count} | 可用: {key_obj.is_available}")
         
-        if attempt < self.max_retries:
-            print(f"⚠️  API 调用失败 (尝试 {attempt + 1}/{self.max_retries})，等待 {self.retry_delay} 秒后重试...")
+        retry = attempt < self.max_retries
+        if retry:
+            lines.append(f"⚠️  API 调用失败 (尝试 {attempt + 1}/{self.max_retries})，等待 {self.retry_delay} 秒后重试...")
+        
+        # 整份报告（含结尾换行）拼成一个字符串一次写出，test-keys 多线程并发测试时各 key 的报告不会交错
+        print("\n".join(lines) + "\n", end="")
+        
+        if retry:
             time.sleep(self.retry_delay)
     
     def _extract_error_code(self, error: Exception) -> int:
@@ -137,7 +145,7 @@ class GeminiClientWrapper:
                 self._current_key = api_key
                 self._current_client = client
                 
-                # 注意：key 使用日志已经在 balancer.get_single_key() 中打印了
+                # 注意：key 使用日志已经在 balancer.get_single_key() 中记录（DEBUG 级别）
                 
                 # 执行操作
                 result = operation(client, *args, **kwargs)
@@ -162,6 +170,41 @@ class GeminiClientWrapper:
         # 所有重试都失败
         raise last_error
     
+    def execute_with_key(
+        self,
+        api_key: str,
+        operation: Callable[["genai.Client"], Any],
+        *args,
+        **kwargs
+    ) -> Any:
+        """
+        使用指定的 key 执行操作，失败时按 max_retries 重试同一个 key
+        
+        不修改当前 client/key，可在多个线程中并发调用
+        
+        Args:
+            api_key: 要使用的 API key
+            operation: 接收 genai.Client 作为第一个参数的函数
+            *args, **kwargs: 传递给 operation 的参数
+        
+        Returns:
+            operation 的返回值
+        
+        Raises:
+            Exception: 当所有重试都失败时抛出最后一个异常
+        """
+        client = self._create_client(api_key)
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = operation(client, *args, **kwargs)
+                self.balancer._mark_key_success(api_key)
+                return result
+            except Exception as e:
+                self._handle_error(api_key, e, attempt)
+                if attempt == self.max_retries:
+                    raise
+    
 
     
     def with_retry(self, max_retries: Optional[int] = None):
@@ -201,7 +244,7 @@ class GeminiClientWrapper:
                             self._current_key = api_key
                             self._current_client = client
                             
-                            # 注意：key 使用日志已经在 balancer.get_single_key() 中打印了
+                            # 注意：key 使用日志已经在 balancer.get_single_key() 中记录（DEBUG 级别）
                         
                         # 调用函数
                         if args and hasattr(args[0], 'generate_content'):
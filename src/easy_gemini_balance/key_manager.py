@@ -6,8 +6,11 @@ All data is stored in and retrieved from SQLite database.
 import os
 import sqlite3
 import threading
+import functools
+import weakref
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Set
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import time
 from pathlib import Path
@@ -103,18 +106,100 @@ class APIKey:
         return key
 
 
+@functools.lru_cache(maxsize=8)
+def _parse_keys_file(file_path: str, mtime_ns: int, size: int) -> Tuple[int, Tuple[Tuple[str, float], ...]]:
+    """
+    Parse a keys file into ``(key, weight)`` entries.
+    
+    ``mtime_ns`` and ``size`` only serve as the cache key, so the file is
+    parsed again as soon as it changes.
+    
+    Returns:
+        Tuple of (total line count, parsed entries)
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            # 支持权重格式: key:weight 或 key
+            if ':' in line:
+                key_part, weight_part = line.split(':', 1)
+                try:
+                    weight = float(weight_part.strip())
+                except ValueError:
+                    weight = 1.0
+                key_str = key_part.strip()
+            else:
+                key_str = line
+                weight = 1.0
+            entries.append((key_str, weight))
+    
+    return len(lines), tuple(entries)
+
+
+# 默认 SQLite PRAGMA：WAL 模式 + synchronous=NORMAL 适合频繁的小事务写入
+DEFAULT_DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'mmap_size': 268435456,
+    'cache_size': -20000,
+}
+
+
 class SQLiteKeyStore:
     """SQLite-based key storage for efficient persistence using SSOT pattern."""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, object]] = None,
+                 read_only: bool = False):
         self.db_path = db_path
         self.lock = threading.RLock()
-        self._init_database()
+        # 只读模式下的连接 URI
+        self._read_only_uri = None
+        pragmas = {**DEFAULT_DB_PRAGMAS, **(pragmas or {})}
+        # journal_mode 持久化在数据库文件中，只需在初始化时设置一次
+        self._journal_mode = pragmas.pop('journal_mode', None)
+        self._connection_pragmas = [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+        if read_only:
+            # 只读模式不修改用户的数据库文件：不创建文件、不切换 journal_mode、不建表/迁移
+            if not Path(db_path).is_file():
+                raise FileNotFoundError(f"Database not found: {db_path}")
+            self._read_only_uri = Path(db_path).resolve().as_uri() + '?mode=ro'
+            self._check_schema()
+        else:
+            self._init_database()
+    
+    def _check_schema(self):
+        """Verify that a read-only database already contains the key table."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='api_keys'")
+            table_exists = cursor.fetchone() is not None
+        finally:
+            conn.close()
+        if not table_exists:
+            raise RuntimeError(f"Database {self.db_path} has no api_keys table; "
+                               f"import or add keys first")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with the configured per-connection PRAGMAs applied."""
+        if self._read_only_uri:
+            conn = sqlite3.connect(self._read_only_uri, uri=True)
+        else:
+            conn = sqlite3.connect(self.db_path)
+        for statement in self._connection_pragmas:
+            conn.execute(statement)
+        return conn
     
     def _init_database(self):
         """Initialize the database with required tables."""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
+            if self._journal_mode:
+                conn.execute(f"PRAGMA journal_mode={self._journal_mode}")
             cursor = conn.cursor()
             
             # 检查表是否存在
@@ -202,7 +287,7 @@ class SQLiteKeyStore:
             True if inserted successfully, False if key already exists
         """
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             try:
@@ -244,7 +329,7 @@ class SQLiteKeyStore:
             True if operation successful
         """
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             try:
@@ -283,7 +368,7 @@ class SQLiteKeyStore:
             APIKey object or None if not found
         """
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -320,7 +405,7 @@ class SQLiteKeyStore:
     def get_all_keys(self) -> List[APIKey]:
         """Get all keys from database."""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -353,10 +438,53 @@ class SQLiteKeyStore:
             conn.close()
             return keys
     
+    # iter_keys 的排序方式 -> ORDER BY 子句（白名单，避免拼接任意 SQL）
+    KEY_ORDERS = {
+        'status': 'is_available DESC, weight DESC',
+        'weight': 'weight DESC',
+        'errors': 'error_count DESC',
+        'last_used': 'last_used DESC',
+        'key': 'key',
+    }
+    
+    def iter_keys(self, available_only: bool = False, by_source: bool = False,
+                  order: str = 'status', limit: Optional[int] = None):
+        """
+        Stream key rows in the requested order.
+        
+        Args:
+            available_only: Only yield available keys
+            by_source: Order by source first so each source forms a contiguous group
+            order: One of KEY_ORDERS; defaults to available first, then by weight descending
+            limit: Maximum number of rows to yield (None for all)
+            
+        Yields:
+            Tuples of (key, weight, is_available, error_count, source, source_count);
+            source_count is None unless by_source is set
+        """
+        if order not in self.KEY_ORDERS:
+            raise ValueError(f"Unknown key order: {order}")
+        where = 'WHERE is_available = 1' if available_only else ''
+        order_by = ('source, ' if by_source else '') + self.KEY_ORDERS[order]
+        # 只有分组输出需要每组数量；不分组时省去窗口函数，ORDER BY ... LIMIT 可直接走索引
+        source_count = 'COUNT(*) OVER (PARTITION BY source)' if by_source else 'NULL'
+        # 只读遍历使用独立连接，不持有 self.lock，避免调用方中途放弃时锁无法释放
+        conn = self._connect()
+        try:
+            yield from conn.execute(f'''
+                SELECT key, weight, is_available, error_count, source, {source_count}
+                FROM api_keys
+                {where}
+                ORDER BY {order_by}
+                LIMIT ?
+            ''', (-1 if limit is None else limit,))
+        finally:
+            conn.close()
+    
     def get_available_keys(self) -> List[APIKey]:
         """Get all available keys from database."""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -390,31 +518,56 @@ class SQLiteKeyStore:
             conn.close()
             return keys
     
+    _UPDATE_KEY_SQL = '''
+        UPDATE api_keys SET
+            weight = ?, is_available = ?, error_count = ?, consecutive_errors = ?,
+            last_used = ?, last_error = ?, updated_time = ?
+        WHERE key = ?
+    '''
+    
+    @staticmethod
+    def _update_params(key: APIKey, updated_time: str) -> tuple:
+        """Build the parameter tuple for _UPDATE_KEY_SQL."""
+        return (
+            key.weight,
+            1 if key.is_available else 0,
+            key.error_count,
+            key.consecutive_errors,
+            key.last_used.isoformat() if key.last_used else None,
+            key.last_error.isoformat() if key.last_error else None,
+            updated_time,
+            key.key
+        )
+    
     def update_key(self, key: APIKey):
         """Update a single key in the database."""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
-            cursor.execute('''
-                UPDATE api_keys SET
-                    weight = ?, is_available = ?, error_count = ?, consecutive_errors = ?,
-                    last_used = ?, last_error = ?, updated_time = ?
-                WHERE key = ?
-            ''', (
-                key.weight,
-                1 if key.is_available else 0,
-                key.error_count,
-                key.consecutive_errors,
-                key.last_used.isoformat() if key.last_used else None,
-                key.last_error.isoformat() if key.last_error else None,
-                datetime.now().isoformat(),
-                key.key
-            ))
+            cursor.execute(self._UPDATE_KEY_SQL, self._update_params(key, datetime.now().isoformat()))
             
             conn.commit()
             conn.close()
     
+    def update_keys(self, keys: List[APIKey]):
+        """Update multiple keys in the database within a single transaction."""
+        if not keys:
+            return
+        
+        with self.lock:
+            conn = self._connect()
+            updated_time = datetime.now().isoformat()
+            
+            try:
+                conn.executemany(
+                    self._UPDATE_KEY_SQL,
+                    [self._update_params(key, updated_time) for key in keys]
+                )
+                conn.commit()
+            finally:
+                conn.close()
+    
     def delete_key(self, key_value: str) -> bool:
         """
         Delete a key from database.
@@ -426,7 +579,7 @@ class SQLiteKeyStore:
             True if deleted successfully, False if not found
         """
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute('DELETE FROM api_keys WHERE key = ?', (key_value,))
@@ -452,57 +605,60 @@ class SQLiteKeyStore:
             raise FileNotFoundError(f"Keys file not found: {file_path}")
         
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             try:
-                # 开始事务
-                cursor.execute('BEGIN TRANSACTION')
+                # 开始事务：立即获取写锁，所有读写都在这一个连接和事务中完成
+                cursor.execute('BEGIN IMMEDIATE')
                 
-                # 读取文件
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
+                # 读取并解析文件（相同路径且未修改的文件只解析一次）
+                stat = os.stat(file_path)
+                total_lines, entries = _parse_keys_file(
+                    os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size
+                )
                 
                 new_keys = 0
                 updated_keys = 0
                 skipped_keys = 0
+                now = datetime.now().isoformat()
+                # 本次导入中已处理 key 的当前权重，文件内重复的 key 无需再查数据库
+                current_weights: Dict[str, float] = {}
+                inserts = []
+                updates = []
                 
-                for line_num, line in enumerate(lines, 1):
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        # 支持权重格式: key:weight 或 key
-                        if ':' in line:
-                            key_part, weight_part = line.split(':', 1)
-                            try:
-                                weight = float(weight_part.strip())
-                            except ValueError:
-                                weight = 1.0
-                            key_str = key_part.strip()
-                        else:
-                            key_str = line
-                            weight = 1.0
-                        
-                        # 检查key是否已存在
-                        existing_key = self.get_key(key_str)
-                        if existing_key:
-                            # 更新现有key的权重
-                            if abs(existing_key.weight - weight) > 0.01:
-                                existing_key.weight = weight
-                                self.update_key(existing_key)
-                                updated_keys += 1
-                            else:
-                                skipped_keys += 1
-                        else:
-                            # 插入新key
-                            new_key = APIKey(
-                                key=key_str,
-                                weight=weight,
-                                source=source
-                            )
-                            if self.insert_key(new_key):
-                                new_keys += 1
-                            else:
-                                skipped_keys += 1
+                for key_str, weight in entries:
+                    # 检查key是否已存在
+                    if key_str in current_weights:
+                        existing_weight = current_weights[key_str]
+                    else:
+                        row = cursor.execute(
+                            'SELECT weight FROM api_keys WHERE key = ?', (key_str,)
+                        ).fetchone()
+                        existing_weight = row[0] if row else None
+                    
+                    if existing_weight is None:
+                        # 插入新key
+                        inserts.append((key_str, weight, now, now, source))
+                        current_weights[key_str] = weight
+                        new_keys += 1
+                    elif abs(existing_weight - weight) > 0.01:
+                        # 更新现有key的权重
+                        updates.append((weight, now, key_str))
+                        current_weights[key_str] = weight
+                        updated_keys += 1
+                    else:
+                        current_weights[key_str] = existing_weight
+                        skipped_keys += 1
+                
+                # 批量写入，插入先于更新执行，文件内先新增后改权重的 key 也能正确处理
+                cursor.executemany('''
+                    INSERT INTO api_keys (key, weight, added_time, updated_time, source)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', inserts)
+                cursor.executemany(
+                    'UPDATE api_keys SET weight = ?, updated_time = ? WHERE key = ?', updates
+                )
                 
                 # 记录导入历史
                 cursor.execute('''
@@ -511,7 +667,7 @@ class SQLiteKeyStore:
                     VALUES (?, ?, ?, ?, ?)
                 ''', (
                     file_path,
-                    len(lines),
+                    total_lines,
                     new_keys,
                     updated_keys,
                     skipped_keys
@@ -521,7 +677,7 @@ class SQLiteKeyStore:
                 cursor.execute('COMMIT')
                 
                 return {
-                    'total_lines': len(lines),
+                    'total_lines': total_lines,
                     'new_keys': new_keys,
                     'updated_keys': updated_keys,
                     'skipped_keys': skipped_keys,
@@ -537,7 +693,7 @@ class SQLiteKeyStore:
     def get_import_history(self) -> List[Dict]:
         """Get import history from database."""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -563,7 +719,7 @@ class SQLiteKeyStore:
     def cleanup_old_keys(self, days_old: int) -> int:
         """Remove keys that haven't been used for specified days."""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             cutoff_date = (datetime.now() - timedelta(days=days_old)).isoformat()
@@ -581,35 +737,43 @@ class SQLiteKeyStore:
     
 
     
+    def get_key_counts(self) -> Dict:
+        """Get total and available key counts with a single query."""
+        with self.lock:
+            conn = self._connect()
+            total_keys, available_keys = conn.execute('''
+                SELECT COUNT(*),
+                       COALESCE(SUM(CASE WHEN is_available = 1 THEN 1 ELSE 0 END), 0)
+                FROM api_keys
+            ''').fetchone()
+            conn.close()
+            
+            return {
+                'total_keys': total_keys,
+                'available_keys': available_keys,
+            }
+    
     def get_stats(self) -> Dict:
         """Get database statistics."""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
-            # 总key数量
-            cursor.execute('SELECT COUNT(*) FROM api_keys')
-            total_keys = cursor.fetchone()[0]
-            
-            # 可用key数量
-            cursor.execute('SELECT COUNT(*) FROM api_keys WHERE is_available = 1')
-            available_keys = cursor.fetchone()[0]
-            
-            # 平均权重
-            cursor.execute('SELECT AVG(weight) FROM api_keys')
-            avg_weight = cursor.fetchone()[0] or 0
+            # 总key数量、可用key数量、平均权重和数据库大小一次查询完成
+            cursor.execute('''
+                SELECT COUNT(*),
+                       COALESCE(SUM(CASE WHEN is_available = 1 THEN 1 ELSE 0 END), 0),
+                       AVG(weight),
+                       (SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size())
+                FROM api_keys
+            ''')
+            total_keys, available_keys, avg_weight, db_size_bytes = cursor.fetchone()
+            avg_weight = avg_weight or 0
             
             # 按来源统计
             cursor.execute('SELECT source, COUNT(*) FROM api_keys GROUP BY source')
             source_stats = dict(cursor.fetchall())
             
-            # 数据库大小
-            cursor.execute('PRAGMA page_count')
-            page_count = cursor.fetchone()[0]
-            cursor.execute('PRAGMA page_size')
-            page_size = cursor.fetchone()[0]
-            db_size_bytes = page_count * page_size
-            
             conn.close()
             
             return {
@@ -623,11 +787,20 @@ class SQLiteKeyStore:
             }
 
 
+def _flush_dirty_keys(key_store: SQLiteKeyStore, dirty_keys: Dict[str, APIKey]):
+    """Write buffered key updates to the store and clear the buffer."""
+    if dirty_keys:
+        pending = list(dirty_keys.values())
+        dirty_keys.clear()
+        key_store.update_keys(pending)
+
+
 class KeyManager:
     """Manages API keys using SSOT pattern - all data from database."""
     
     def __init__(self, db_path: Optional[str] = None, auto_save: bool = True, 
-                 save_interval: int = 300):
+                 save_interval: int = 300, db_pragmas: Optional[Dict[str, object]] = None,
+                 write_behind: bool = False, read_only: bool = False):
         """
         Initialize the key manager.
         
@@ -635,6 +808,11 @@ class KeyManager:
             db_path: Path to the SQLite database (defaults to XDG_DATA_HOME)
             auto_save: Whether to automatically save state periodically
             save_interval: Auto-save interval in seconds
+            db_pragmas: SQLite PRAGMA overrides merged over DEFAULT_DB_PRAGMAS
+            write_behind: Whether to buffer health updates and write them on the
+                next save or flush_updates() instead of immediately
+            read_only: Open database connections read-only and disable auto-save;
+                any write raises sqlite3.OperationalError
         """
         if db_path is None:
             # 使用 XDG_DATA_HOME 目录
@@ -651,16 +829,29 @@ class KeyManager:
             db_path = str(data_dir / 'keys.db')
         
         self.db_path = db_path
-        self.auto_save = auto_save
+        # 只读模式不会修改数据库，也就无需自动保存
+        self.auto_save = auto_save and not read_only
         self.save_interval = save_interval
         
         self.keys: List[APIKey] = []
-        self.keys_set: Set[str] = set()
+        self.keys_by_value: Dict[str, APIKey] = {}
+        # 每当 key 集合或可用状态变化时递增，供 KeyBalancer 判断缓存是否失效
+        self.keys_version = 0
+        # 可用 keys 的缓存，keys_version 变化时重建
+        self._available_keys: List[APIKey] = []
+        self._available_keys_version = -1
         self.last_save_time = datetime.now()
         self.lock = threading.RLock()
+        # batch_updates() 期间待写入数据库的 keys
+        self._pending_updates: Optional[Dict[str, APIKey]] = None
+        # write_behind 模式下尚未写入数据库的 keys
+        self.write_behind = write_behind
+        self._dirty_keys: Dict[str, APIKey] = {}
         
         # 初始化SQLite存储
-        self.key_store = SQLiteKeyStore(db_path)
+        self.key_store = SQLiteKeyStore(db_path, pragmas=db_pragmas, read_only=read_only)
+        # 对象回收或解释器退出时写入剩余的缓冲更新
+        weakref.finalize(self, _flush_dirty_keys, self.key_store, self._dirty_keys)
         
         # 从数据库加载所有keys
         self._load_from_database()
@@ -673,7 +864,8 @@ class KeyManager:
         """Load all keys from database."""
         try:
             self.keys = self.key_store.get_all_keys()
-            self.keys_set = {key.key for key in self.keys}
+            self.keys_by_value = {key.key: key for key in self.keys}
+            self.keys_version += 1
             
             if self.keys:
                 print(f"✅ Loaded {len(self.keys)} keys from database: {self.db_path}")
@@ -683,14 +875,16 @@ class KeyManager:
         except Exception as e:
             print(f"⚠️  Error loading from database: {e}, starting fresh")
             self.keys = []
-            self.keys_set = set()
+            self.keys_by_value = {}
+            self.keys_version += 1
     
     def _save_state(self):
         """Save current key states to database."""
         try:
             if self.keys:
-                for key in self.keys:
-                    self.key_store.update_key(key)
+                # 全量写入已包含所有缓冲的更新
+                self._dirty_keys.clear()
+                self.key_store.update_keys(self.keys)
                 self.last_save_time = datetime.now()
                 
         except Exception as e:
@@ -741,14 +935,15 @@ class KeyManager:
         Returns:
             True if added successfully, False if key already exists
         """
-        if key_value in self.keys_set:
+        if key_value in self.keys_by_value:
             return False
         
         new_key = APIKey(key=key_value, weight=weight, source=source)
         
         if self.key_store.insert_key(new_key):
             self.keys.append(new_key)
-            self.keys_set.add(key_value)
+            self.keys_by_value[key_value] = new_key
+            self.keys_version += 1
             return True
         
         return False
@@ -763,12 +958,13 @@ class KeyManager:
         Returns:
             True if removed successfully, False if not found
         """
-        if key_value not in self.keys_set:
+        if key_value not in self.keys_by_value:
             return False
         
         if self.key_store.delete_key(key_value):
             self.keys = [k for k in self.keys if k.key != key_value]
-            self.keys_set.remove(key_value)
+            del self.keys_by_value[key_value]
+            self.keys_version += 1
             return True
         
         return False
@@ -776,14 +972,33 @@ class KeyManager:
     def get_available_keys(self) -> List[APIKey]:
         """Get all available keys."""
         with self.lock:
-            return [key for key in self.keys if key.is_available]
+            if self._available_keys_version != self.keys_version:
+                self._available_keys = [key for key in self.keys if key.is_available]
+                self._available_keys_version = self.keys_version
+            # 返回副本，调用方修改列表不会影响缓存
+            return self._available_keys.copy()
     
     def get_key_by_value(self, key_value: str) -> Optional[APIKey]:
         """Get an APIKey object by its key value."""
         with self.lock:
-            if key_value in self.keys_set:
-                return next((key for key in self.keys if key.key == key_value), None)
-            return None
+            return self.keys_by_value.get(key_value)
+    
+    def mark_keys_used(self, key_values: List[str]):
+        """
+        Set ``last_used`` on several keys with a single timestamp.
+        
+        Only the in-memory state is updated; it is persisted with the next save.
+        
+        Args:
+            key_values: The actual key strings
+        """
+        now = datetime.now()
+        with self.lock:
+            keys_by_value = self.keys_by_value
+            for key_value in key_values:
+                key = keys_by_value.get(key_value)
+                if key:
+                    key.last_used = now
     
     def update_key_health(self, key_value: str, error_code: Optional[int] = None, success: bool = False):
         """
@@ -797,19 +1012,64 @@ class KeyManager:
         with self.lock:
             key = self.get_key_by_value(key_value)
             if key:
+                was_available = key.is_available
                 if success:
                     key.mark_success()
                 elif error_code is not None:
                     key.mark_error(error_code)
+                if key.is_available != was_available:
+                    self.keys_version += 1
                 
-                # 立即更新数据库
-                self.key_store.update_key(key)
+                if self._pending_updates is not None:
+                    # 批量模式：延迟到 batch_updates() 退出时统一写入
+                    self._pending_updates[key.key] = key
+                elif self.write_behind:
+                    # 延迟写入：由下一次保存或 flush_updates() 统一写入
+                    self._dirty_keys[key.key] = key
+                else:
+                    # 立即更新数据库
+                    self.key_store.update_key(key)
+    
+    @contextmanager
+    def batch_updates(self):
+        """
+        Buffer health updates and write them to the database in one transaction.
+        
+        Updates from every thread are buffered while the batch is open.
+        Nested calls join the outermost batch.
+        """
+        with self.lock:
+            outermost = self._pending_updates is None
+            if outermost:
+                self._pending_updates = {}
+        
+        try:
+            yield
+        finally:
+            if outermost:
+                with self.lock:
+                    pending = list(self._pending_updates.values())
+                    self._pending_updates = None
+                    self.key_store.update_keys(pending)
+    
+    def flush_updates(self):
+        """Write health updates buffered in write-behind mode in one transaction."""
+        with self.lock:
+            _flush_dirty_keys(self.key_store, self._dirty_keys)
     
-    def get_key_stats(self) -> Dict:
-        """Get statistics about all keys."""
+    def get_key_stats(self, include_keys: bool = True) -> Dict:
+        """
+        Get statistics about all keys.
+        
+        Args:
+            include_keys: Whether to include per-key details under ``keys``;
+                aggregate-only callers can skip building one dict per key
+        """
+        # 统计信息来自数据库，先写入缓冲的更新
+        self.flush_updates()
         db_stats = self.key_store.get_stats()
         
-        return {
+        stats = {
             'total_keys': db_stats['total_keys'],
             'available_keys': db_stats['available_keys'],
             'unavailable_keys': db_stats['unavailable_keys'],
@@ -817,7 +1077,9 @@ class KeyManager:
             'source_distribution': db_stats['source_distribution'],
             'database_size_mb': db_stats['database_size_mb'],
             'last_save': self.last_save_time.isoformat(),
-            'keys': [
+        }
+        if include_keys:
+            stats['keys'] = [
                 {
                     'key': key.key[:8] + '...' if len(key.key) > 8 else key.key,
                     'weight': round(key.weight, 2),
@@ -831,7 +1093,20 @@ class KeyManager:
                 }
                 for key in self.keys
             ]
-        }
+        return stats
+    
+    def get_key_counts(self) -> Dict:
+        """Get total and available key counts without building per-key details."""
+        self.flush_updates()
+        return self.key_store.get_key_counts()
+    
+    def iter_keys(self, available_only: bool = False, by_source: bool = False,
+                  order: str = 'status', limit: Optional[int] = None):
+        """Stream key rows from the database; see SQLiteKeyStore.iter_keys."""
+        self.flush_updates()
+        return self.key_store.iter_keys(
+            available_only=available_only, by_source=by_source, order=order, limit=limit
+        )
     
     def get_import_history(self) -> List[Dict]:
         """Get import history."""
@@ -846,6 +1121,7 @@ class KeyManager:
         with self.lock:
             for key in self.keys:
                 key.reset_weight()
+            self.keys_version += 1
             self._save_state()
     
     def cleanup_old_keys(self, days_old: int = 30):
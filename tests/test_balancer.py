@@ -5,12 +5,17 @@ Simple test script for the Easy Gemini Balance module.
 
 import sys
 import os
+import logging
+import sqlite3
+import tempfile
+import time
 from pathlib import Path
 
 # Add src to path for testing
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from easy_gemini_balance import KeyBalancer, KeyManager, APIKey
+from easy_gemini_balance.balancer import LRUCache
 
 
 def test_basic_functionality():
@@ -120,6 +125,429 @@ def test_weight_distribution():
         return False
 
 
+class _FakeHTTPError(Exception):
+    """Exception carrying an HTTP status code, like google-genai/requests errors."""
+    
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_call_with_failover():
+    """Test that a failed call moves on to the next key."""
+    print("\n🧪 Testing call_with_failover...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        for i in range(3):
+            balancer.key_manager.add_key(f"AIzaSyFailover_Key{i}")
+        
+        attempted = []
+        
+        def flaky_call(key):
+            attempted.append(key)
+            if len(attempted) < 3:
+                raise _FakeHTTPError(429 if len(attempted) == 1 else 403)
+            return key
+        
+        result = balancer.call_with_failover(flaky_call)
+        
+        assert result == attempted[-1]
+        assert len(set(attempted)) == 3
+        assert balancer.key_manager.get_key_by_value(attempted[0]).weight < 1.0
+        assert not balancer.key_manager.get_key_by_value(attempted[1]).is_available
+        
+        # max_attempts limits how many keys are tried before giving up
+        def always_fails(key):
+            raise _FakeHTTPError(500)
+        
+        try:
+            balancer.call_with_failover(always_fails, max_attempts=1)
+        except _FakeHTTPError:
+            pass
+        else:
+            raise AssertionError("call_with_failover should re-raise the last error")
+        
+        # 调用方错误不切换 key，也不影响 key 健康状态
+        def health():
+            return [(k.is_available, k.error_count, k.weight) for k in balancer.key_manager.keys]
+        
+        for error in (_FakeHTTPError(400), NameError("bug")):
+            before = health()
+            tried = []
+            
+            def caller_error(key, error=error):
+                tried.append(key)
+                raise error
+            
+            try:
+                balancer.call_with_failover(caller_error)
+            except type(error):
+                pass
+            else:
+                raise AssertionError("call_with_failover should re-raise caller errors")
+            assert len(tried) == 1
+            assert health() == before
+    
+    # 候选 keys 覆盖整个可用池，而不只是前 5 个加权选择窗口
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        for i in range(8):
+            balancer.key_manager.add_key(f"AIzaSyFailover_Pool{i}")
+        
+        attempted = []
+        
+        def fails_until_last(key):
+            attempted.append(key)
+            if len(attempted) < 8:
+                raise _FakeHTTPError(503)
+            return key
+        
+        assert balancer.call_with_failover(fails_until_last) == attempted[-1]
+        assert len(set(attempted)) == 8
+    
+    print("✅ call_with_failover test passed!")
+
+
+def test_health_batch():
+    """Test that batched health updates are persisted on exit."""
+    print("\n🧪 Testing health_batch...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        keys = [f"AIzaSyBatch_Key{i}" for i in range(3)]
+        for key in keys:
+            balancer.key_manager.add_key(key)
+        
+        store = balancer.key_manager.key_store
+        with balancer.health_batch():
+            for key in keys:
+                balancer.update_key_health(key, error_code=429)
+            # 批量模式下尚未写入数据库
+            assert store.get_key(keys[0]).error_count == 0
+        
+        for key in keys:
+            assert store.get_key(key).error_count == 1
+    
+    print("✅ health_batch test passed!")
+
+
+def test_write_behind():
+    """Test that write-behind mode buffers health updates until flushed."""
+    print("\n🧪 Testing write-behind updates...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False, write_behind=True)
+        key_manager = balancer.key_manager
+        key_manager.add_key("buffered_key")
+        store = key_manager.key_store
+        
+        balancer.update_key_health("buffered_key", error_code=500)
+        balancer.update_key_health("buffered_key", error_code=500)
+        assert store.get_key("buffered_key").error_count == 0
+        
+        key_manager.flush_updates()
+        assert store.get_key("buffered_key").error_count == 2
+        
+        # 统计信息来自数据库，读取前会先写入缓冲的更新
+        balancer.update_key_health("buffered_key", error_code=400)
+        assert balancer.get_stats()['available_keys'] == 0
+    
+    print("✅ Write-behind test passed!")
+
+
+def test_concurrent_selection():
+    """Test that selecting keys from several threads does not corrupt the LRU order."""
+    print("\n🧪 Testing concurrent key selection...")
+    
+    from concurrent.futures import ThreadPoolExecutor
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), cache_size=50, auto_save=False)
+        for i in range(200):
+            balancer.key_manager.add_key(f"AIzaSyThread_Key{i:03d}")
+        
+        def select(worker):
+            for i in range(300):
+                if (worker + i) % 2:
+                    balancer.get_single_key()
+                else:
+                    balancer.get_keys(3)
+        
+        # 缩短线程切换间隔，让竞争在少量迭代内就能出现
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                # result() 会重新抛出线程中的异常（如 OrderedDict mutated during iteration）
+                for future in [pool.submit(select, worker) for worker in range(8)]:
+                    future.result()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        
+        assert len(balancer._lru_keys) == 200
+        assert balancer.selection_count == 8 * 300
+    
+    print("✅ Concurrent selection test passed!")
+
+
+def test_lru_rotation():
+    """Test that cached LRU order rotates and picks up new keys."""
+    print("\n🧪 Testing LRU rotation...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        for i in range(3):
+            balancer.key_manager.add_key(f"rotate_key_{i}")
+        
+        # 从未使用过的 keys 优先，连续选择应轮转到不同的 key
+        selected = [balancer.get_single_key() for _ in range(3)]
+        assert len(set(selected)) == 3
+        
+        # 构造后新增的 key 从未使用过，应被下一次选择选中
+        balancer.key_manager.add_key("rotate_key_new")
+        assert balancer.get_single_key() == "rotate_key_new"
+        
+        # 一次选择中的多个 key 共用同一个 last_used 时间戳
+        selected = balancer.get_keys(3)
+        last_used = {balancer.key_manager.get_key_by_value(k).last_used for k in selected}
+        assert len(last_used) == 1
+    
+    print("✅ LRU rotation test passed!")
+
+
+def test_lru_cache_invalidation():
+    """Test that the cached LRU order is only rebuilt when keys change."""
+    print("\n🧪 Testing LRU cache invalidation...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        for i in range(3):
+            balancer.key_manager.add_key(f"cached_key_{i}")
+        
+        balancer.get_single_key()
+        lru_keys = balancer._lru_keys
+        for _ in range(5):
+            balancer.get_single_key()
+        # 没有任何变化时不应重建
+        assert balancer._lru_keys is lru_keys
+        
+        # 仅调整权重不影响可用集合，不应重建
+        balancer.update_key_health("cached_key_0", error_code=500)
+        balancer.get_single_key()
+        assert balancer._lru_keys is lru_keys
+        
+        # key 变为不可用时重建，且不再被选中
+        balancer.update_key_health("cached_key_1", error_code=400)
+        selected = {balancer.get_single_key() for _ in range(4)}
+        assert balancer._lru_keys is not lru_keys
+        assert "cached_key_1" not in selected
+        
+        lru_keys = balancer._lru_keys
+        balancer.reset_all_weights()
+        assert balancer._lru_keys is not lru_keys
+        assert "cached_key_1" in balancer._lru_keys
+    
+    print("✅ LRU cache invalidation test passed!")
+
+
+def test_lru_cache_hit_rate():
+    """Test LRU cache hit/miss accounting."""
+    print("\n🧪 Testing LRU cache hit rate...")
+    
+    cache = LRUCache(2)
+    key = APIKey(key="cached_key")
+    cache.put(key.key, key)
+    
+    assert cache.get("cached_key") is key
+    assert cache.get("cached_key") is key
+    assert cache.get("missing_key") is None
+    
+    stats = cache.get_stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+    assert abs(stats['hit_rate'] - 2 / 3) < 1e-9
+    
+    cache.clear()
+    assert cache.get_stats()['hit_rate'] == 0
+    
+    print("✅ LRU cache hit rate test passed!")
+
+
+def test_selection_rate_limit():
+    """Test that selection throttling only applies when blocking is requested."""
+    print("\n🧪 Testing selection rate limit...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        balancer.key_manager.add_key("rate_key")
+        balancer.min_selection_interval = 0.2
+        assert balancer.get_stats()['last_selection_wall'] is None
+        
+        start = time.monotonic()
+        balancer.get_single_key()
+        balancer.get_single_key()
+        assert time.monotonic() - start < 0.2
+        
+        start = time.monotonic()
+        balancer.get_keys(1, block=True)
+        assert time.monotonic() - start >= 0.15
+        assert abs(balancer.get_stats()['last_selection_wall'] - time.time()) < 1
+    
+    print("✅ Selection rate limit test passed!")
+
+
+def test_key_info_cache():
+    """Test that cached key info is refreshed on change and safe to mutate."""
+    print("\n🧪 Testing key info cache...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        balancer.key_manager.add_key("info_key")
+        
+        info = balancer.get_key_info("info_key")
+        info['weight'] = -1
+        assert balancer.get_key_info("info_key")['weight'] == 1.0
+        
+        balancer.update_key_health("info_key", error_code=500)
+        info = balancer.get_key_info("info_key")
+        assert info['error_count'] == 1
+        assert info['weight'] == 0.8
+    
+    print("✅ Key info cache test passed!")
+
+
+def test_key_usage_logging(caplog):
+    """Test that key usage is reported through DEBUG logging."""
+    print("\n🧪 Testing key usage logging...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        balancer.key_manager.add_key("log_key")
+        
+        with caplog.at_level(logging.INFO, logger="easy_gemini_balance.balancer"):
+            balancer.get_single_key()
+        assert "使用 Key" not in caplog.text
+        
+        with caplog.at_level(logging.DEBUG, logger="easy_gemini_balance.balancer"):
+            balancer.get_single_key()
+            balancer.get_keys(1, block=True)
+        assert caplog.text.count("使用 Key: log_key") == 2
+    
+    print("✅ Key usage logging test passed!")
+
+
+def test_stats_summary():
+    """Test that the lightweight stats summary matches the full stats counts."""
+    print("\n🧪 Testing stats summary...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        for i in range(3):
+            balancer.key_manager.add_key(f"summary_key_{i}")
+        for _ in range(3):
+            balancer.update_key_health("summary_key_0", error_code=403)
+        balancer.key_manager.save_state_now()
+        
+        summary = balancer.get_stats_summary()
+        stats = balancer.get_stats()
+        assert set(summary) == {'total_keys', 'available_keys', 'cache_stats'}
+        assert summary['total_keys'] == stats['total_keys'] == 3
+        assert summary['available_keys'] == stats['available_keys']
+        
+        aggregates = balancer.key_manager.get_key_stats(include_keys=False)
+        assert 'keys' not in aggregates and len(stats['keys']) == 3
+        assert aggregates['database_size_mb'] == stats['database_size_mb'] > 0
+    
+    print("✅ Stats summary test passed!")
+
+
+def test_read_only_mode():
+    """Test that a read-only balancer reads existing keys but cannot write."""
+    print("\n🧪 Testing read-only mode...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "keys.db")
+        writer = KeyBalancer(db_path=db_path, auto_save=False)
+        writer.key_manager.add_key("ro_key")
+        
+        reader = KeyBalancer(db_path=db_path, read_only=True)
+        assert reader.key_manager.auto_save is False
+        assert reader.get_stats_summary()['total_keys'] == 1
+        
+        conn = reader.key_manager.key_store._connect()
+        try:
+            conn.execute("DELETE FROM api_keys")
+            assert False, "read-only connection accepted a write"
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+        
+        # 只读打开不改变 journal_mode，也不会创建不存在的数据库
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+        KeyBalancer(db_path=db_path, read_only=True)
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        conn.close()
+        
+        missing_path = os.path.join(temp_dir, "missing.db")
+        try:
+            KeyBalancer(db_path=missing_path, read_only=True)
+            assert False, "read-only mode opened a missing database"
+        except FileNotFoundError:
+            pass
+        assert os.listdir(temp_dir) == ["keys.db"]
+    
+    print("✅ Read-only mode test passed!")
+
+
+def test_import_keys_batch():
+    """Test importing new, updated and duplicate keys in one batch."""
+    print("\n🧪 Testing batched key import...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        keys_file = os.path.join(temp_dir, "keys.txt")
+        with open(keys_file, "w") as f:
+            f.write("# comment\nimport_a:1.0\nimport_b\nimport_a:2.0\nimport_c:0.5\nimport_c:0.5\n")
+        
+        manager = KeyManager(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        manager.add_key("import_b", weight=1.0)
+        result = manager.import_keys_from_file(keys_file, source="batch")
+        
+        assert (result['new_keys'], result['updated_keys'], result['skipped_keys']) == (2, 1, 2)
+        assert manager.get_key_by_value("import_a").weight == 2.0
+        assert len(manager.keys) == 3
+    
+    print("✅ Batched key import test passed!")
+
+
+def test_db_pragmas():
+    """Test that the key store applies default and overridden SQLite PRAGMAs."""
+    print("\n🧪 Testing database PRAGMAs...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        balancer = KeyBalancer(db_path=os.path.join(temp_dir, "keys.db"), auto_save=False)
+        conn = balancer.key_manager.key_store._connect()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        conn.close()
+        
+        balancer = KeyBalancer(
+            db_path=os.path.join(temp_dir, "full.db"),
+            auto_save=False,
+            db_pragmas={'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+        )
+        conn = balancer.key_manager.key_store._connect()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+        conn.close()
+    
+    print("✅ Database PRAGMAs test passed!")
+
+
 def main():
     """Run all tests."""
     print("🚀 Easy Gemini Balance - Test Suite\n")
@@ -254,6 +254,128 @@ def test_cli_json_output():
         return False
 
 
+def test_cli_lazy_subcommands():
+    """Test that only the selected subcommand gets its arguments built."""
+    print("🧪 Testing CLI lazy subcommand arguments...")
+    
+    cli = EasyGeminiCLI()
+    assert set(cli._COMMAND_HANDLERS) == set(cli._COMMANDS)
+    assert cli._find_command(['--db-path', 'list', 'cleanup', '--days', '3']) == 'cleanup'
+    assert cli._find_command(['--json']) is None
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'keys.db')
+        assert cli.run(['--db-path', db_path, 'add-key', 'AIzaSyLazy']) == 0
+        result = cli.run(['--db-path', db_path, 'list', '--available-only'])
+    
+    assert result == 0
+    assert 'list' in cli._built_commands and 'test-keys' not in cli._built_commands
+    # 解析器在实例间共用，已添加的子命令参数不会重复添加
+    assert EasyGeminiCLI().parser is cli.parser
+    print("✅ CLI lazy subcommand arguments work")
+
+
+def test_cli_list_order(capsys):
+    """Test that list streams keys grouped by source, available first."""
+    print("🧪 Testing CLI list ordering...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'keys.db')
+        cli = EasyGeminiCLI()
+        assert cli.run(['--db-path', db_path, 'add-key', 'AIzaSyManual_low', '--weight', '0.5']) == 0
+        assert cli.run(['--db-path', db_path, 'add-key', 'AIzaSyManual_high', '--weight', '2']) == 0
+        assert cli.run(['--db-path', db_path, 'add-key', 'AIzaSyOther', '--source', 'other']) == 0
+        capsys.readouterr()
+        
+        assert cli.run(['--db-path', db_path, 'list', '--by-source']) == 0
+        out = capsys.readouterr().out
+        lines = [line for line in out.splitlines() if line.startswith(('📁', '✅ AIza'))]
+        
+        assert cli.run(['--db-path', db_path, 'list', '--sort-by', 'weight', '--limit', '1']) == 0
+        limited_out = capsys.readouterr().out
+        limited = [line for line in limited_out.splitlines() if line.startswith('✅ AIza')]
+    
+    assert len(limited) == 1 and 'Weight: 2.0' in limited[0]
+    assert '🔑 All Keys (showing 1 of 3):' in limited_out
+    assert lines[0].startswith('📁 Source: manual (2 keys)')
+    assert 'Weight: 2.0' in lines[1] and 'Weight: 0.5' in lines[2]
+    assert lines[3].startswith('📁 Source: other (1 keys)')
+    print("✅ CLI list ordering works")
+
+
+def test_cli_json_compact(capsys):
+    """Test that JSON output is compact when stdout is not a terminal."""
+    print("🧪 Testing CLI compact JSON output...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'keys.db')
+        cli = EasyGeminiCLI()
+        assert cli.run(['--db-path', db_path, 'add-key', 'AIzaSyCompact']) == 0
+        capsys.readouterr()
+        assert cli.run(['--db-path', db_path, '--json', 'db-info']) == 0
+        last_line = capsys.readouterr().out.splitlines()[-1]
+    
+    assert json.loads(last_line)['total_keys_in_db'] == 1
+    assert ', ' not in last_line and ': ' not in last_line
+    print("✅ CLI compact JSON output works")
+
+
+def test_cli_list_ndjson(capsys):
+    """Test that list --json streams one JSON record per line."""
+    print("🧪 Testing CLI list NDJSON output...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'keys.db')
+        cli = EasyGeminiCLI()
+        assert cli.run(['--db-path', db_path, 'add-key', 'AIzaSyFirst', '--weight', '0.5']) == 0
+        assert cli.run(['--db-path', db_path, 'add-key', 'AIzaSySecond', '--weight', '2']) == 0
+        capsys.readouterr()
+        
+        assert cli.run(['--db-path', db_path, '--json', 'list', '--sort-by', 'weight']) == 0
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines()
+                   if line.startswith('{')]
+    
+    assert [record['weight'] for record in records] == [2.0, 0.5]
+    assert all(record['key'].endswith('...') and record['available'] for record in records)
+    print("✅ CLI list NDJSON output works")
+
+
+def test_cli_json_fallback(monkeypatch):
+    """Test that the stdlib JSON fallback matches the orjson output."""
+    print("🧪 Testing CLI JSON serializer fallback...")
+    
+    from easy_gemini_balance import cli as cli_module
+    obj = {'total_keys': 2, 'sources': {None: 1, 'manual': 1}, 'weight': 0.5}
+    fast = cli_module._dumps_json(obj)
+    monkeypatch.setattr(cli_module, 'ORJSON_AVAILABLE', False)
+    fallback = cli_module._dumps_json(obj)
+    
+    assert ', ' not in fallback and ': ' not in fallback
+    assert json.loads(fast) == json.loads(fallback)
+    assert json.loads(cli_module._dumps_json(obj, indent=True)) == json.loads(fallback)
+    
+    # 没有 orjson 时 _emit_json 分块流式写入 stdout，而不是先拼出整个文档
+    class ChunkRecorder:
+        def __init__(self):
+            self.chunks = []
+        
+        def write(self, text):
+            self.chunks.append(text)
+        
+        def isatty(self):
+            return False
+    
+    class Args:
+        json_compact = True
+    
+    recorder = ChunkRecorder()
+    monkeypatch.setattr(sys, 'stdout', recorder)
+    EasyGeminiCLI()._emit_json(obj, Args())
+    assert len(recorder.chunks) > 2
+    assert json.loads(''.join(recorder.chunks)) == json.loads(fast)
+    print("✅ CLI JSON serializer fallback works")
+
+
 def main():
     """Run all CLI tests."""
     print("🚀 Easy Gemini Balance - CLI Test Suite\n")
@@ -234,6 +234,27 @@ class TestGeminiClientIntegration:
                 assert stats['total_keys'] == 2
                 assert stats['available_keys'] >= 1
 
+    
+    def test_execute_with_key(self):
+        """测试使用指定 key 执行并重试"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            balancer = KeyBalancer(db_path=os.path.join(temp_dir, "test.db"), auto_save=False)
+            balancer.key_manager.add_key("AIzaSyTest_Key1")
+            balancer.key_manager.add_key("AIzaSyTest_Key2")
+            
+            with patch('easy_gemini_balance.gemini_client.GEMINI_AVAILABLE', True):
+                wrapper = GeminiClientWrapper(balancer=balancer, max_retries=1, retry_delay=0)
+                
+                with patch.object(wrapper, '_create_client', side_effect=lambda key: key):
+                    assert wrapper.execute_with_key("AIzaSyTest_Key2", lambda client: client) == "AIzaSyTest_Key2"
+                    
+                    failing_op = Mock(side_effect=Exception("Simulated failure"))
+                    with pytest.raises(Exception):
+                        wrapper.execute_with_key("AIzaSyTest_Key1", failing_op)
+                    assert failing_op.call_count == 2
+                    assert balancer.key_manager.get_key_by_value("AIzaSyTest_Key1").error_count == 2
+                    assert wrapper.get_current_key() is None
+
 
 if __name__ == "__main__":
     # 运行测试